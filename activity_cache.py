@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+
+from activity_frame import ActivityFrame
+
+# Users whose history is kept per process before the least recently used are evicted
+MAX_CACHED_USERS = 128
+
+
+class ActivityCache:
+    """Process-wide activity history of each user, reloaded only when their store's files change
+
+    Entries are keyed by store directory and hold the ActivityFrame loaded
+    for one ActivityStore.version(), so every session of a user shares one
+    frame. Cached frames are never changed: append() writes the store and
+    publishes a copy with the entry added, so the session that logged it
+    never reads it back from disk while other sessions keep reading the
+    frame they already hold.
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_USERS):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per user serializes their appends without blocking other users on disk writes
+        self._user_locks = {}
+
+    def get(self, store):
+        """The store's history as a shared ActivityFrame, loading it only if the files changed since it was cached"""
+        version = store.version()
+        with self._lock:
+            entry = self._entries.get(store.directory)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(store.directory)
+                return entry[1]
+
+        frame = ActivityFrame.from_frame(store.load())
+        # Loading can import a legacy CSV, and another process may write meanwhile; only cache a stable read
+        if store.version() == version:
+            with self._lock:
+                self._entries[store.directory] = (version, frame)
+                self._entries.move_to_end(store.directory)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return frame
+
+    def _user_lock(self, directory):
+        with self._lock:
+            return self._user_locks.setdefault(directory, threading.Lock())
+
+    def append(self, store, entry):
+        """Append an entry to the store and, if the cached frame is current, publish it with the entry added"""
+        with self._user_lock(store.directory):
+            with self._lock:
+                cached = self._entries.get(store.directory)
+            before = store.version()
+            store.append(entry)
+            after = store.version()
+
+            frame = None
+            if cached is not None and cached[0] == before:
+                frame = cached[1].copy()
+                frame.append(entry)
+            with self._lock:
+                # A frame cached for an older version is dropped and reloaded on the next get()
+                if frame is None or self._entries.get(store.directory) is not cached:
+                    self._entries.pop(store.directory, None)
+                else:
+                    self._entries[store.directory] = (after, frame)
+                    self._entries.move_to_end(store.directory)
+
+    def invalidate(self, directory):
+        """Drop a user's cached history (e.g. after it was reset)"""
+        with self._lock:
+            self._entries.pop(directory, None)
+
+    def __len__(self):
+        return len(self._entries)
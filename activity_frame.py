@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+from activity_store import ACTIVITY_COLUMNS, ACTIVITY_DTYPES
+
+INITIAL_CAPACITY = 64
+
+
+class ActivityFrame:
+    """A user's activity history as typed column arrays with a date index
+
+    Columns are datetime64[ns] dates plus int32/float32 metrics, grown in
+    place with amortized O(1) appends. The date index maps each logged day to
+    its row, so duplicate checks are O(1), and view() hands pandas the
+    underlying arrays without copying them.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self._size = 0
+        self._columns = {"date": np.empty(capacity, dtype="datetime64[ns]")}
+        for column, dtype in ACTIVITY_DTYPES.items():
+            self._columns[column] = np.empty(capacity, dtype=dtype)
+        self._day_index = {}
+        self._last_day = None
+        self._sorted = True
+
+    @classmethod
+    def from_frame(cls, df):
+        """Wrap a loaded activity DataFrame (e.g. from ActivityStore.load)"""
+        frame = cls(capacity=max(len(df), INITIAL_CAPACITY))
+        if df.empty:
+            return frame
+        size = len(df)
+        frame._columns["date"][:size] = pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[ns]")
+        for column, dtype in ACTIVITY_DTYPES.items():
+            frame._columns[column][:size] = df[column].to_numpy(dtype=dtype)
+        frame._size = size
+        days = frame._columns["date"][:size].astype("datetime64[D]").astype("int64")
+        frame._day_index = dict(zip(days.tolist(), range(size)))
+        frame._last_day = int(days.max())
+        frame._sorted = bool(np.all(np.diff(days) > 0))
+        return frame
+
+    def copy(self):
+        """An independent copy to append to without changing this frame for its other readers"""
+        frame = ActivityFrame(capacity=len(self._columns["date"]))
+        for column, values in self._columns.items():
+            frame._columns[column][:self._size] = values[:self._size]
+        frame._size = self._size
+        frame._day_index = dict(self._day_index)
+        frame._last_day = self._last_day
+        frame._sorted = self._sorted
+        return frame
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _day(value):
+        return int(np.datetime64(pd.Timestamp(value).date(), "D").astype("int64"))
+
+    def has_date(self, value):
+        """Whether a day already has an entry"""
+        return self._day(value) in self._day_index
+
+    def append(self, entry):
+        """Append one entry, growing the column arrays geometrically"""
+        if self._size == len(self._columns["date"]):
+            for column, values in self._columns.items():
+                grown = np.empty(max(2 * len(values), INITIAL_CAPACITY), dtype=values.dtype)
+                grown[:self._size] = values[:self._size]
+                self._columns[column] = grown
+
+        row = self._size
+        day = self._day(entry["date"])
+        self._columns["date"][row] = np.datetime64(day, "D")
+        for column in ACTIVITY_DTYPES:
+            self._columns[column][row] = entry[column]
+        if self._last_day is not None and day < self._last_day:
+            self._sorted = False
+        self._last_day = day if self._last_day is None else max(self._last_day, day)
+        self._day_index[day] = row
+        self._size += 1
+
+    def column(self, name):
+        """Read-only view of one column"""
+        values = self._columns[name][:self._size]
+        values.flags.writeable = False
+        return values
+
+    def mean(self, name):
+        """Mean of a metric column"""
+        return float(self.column(name).mean()) if self._size else float("nan")
+
+    def view(self):
+        """DataFrame over the column arrays, in insertion order, without copying"""
+        return pd.DataFrame({column: self.column(column) for column in ACTIVITY_COLUMNS}, copy=False)
+
+    def sorted_view(self, ascending=True):
+        """DataFrame sorted by date; zero-copy when entries were logged in date order"""
+        df = self.view()
+        if self._sorted:
+            return df if ascending else df.iloc[::-1]
+        return df.sort_values("date", ascending=ascending, ignore_index=True)
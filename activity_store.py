@@ -0,0 +1,137 @@
+import os
+import shutil
+
+import pandas as pd
+
+from fitbit_cache import cache_lock
+
+ACTIVITY_COLUMNS = ["date", "steps", "calories", "sleep_hours"]
+ACTIVITY_DTYPES = {"steps": "int32", "calories": "int32", "sleep_hours": "float32"}
+
+# Journal rows folded into the Parquet file at a time
+COMPACT_EVERY = 32
+
+
+def empty_activity_frame():
+    """Return an empty, correctly typed activity DataFrame"""
+    df = pd.DataFrame({"date": pd.Series(dtype="datetime64[ns]")})
+    for column, dtype in ACTIVITY_DTYPES.items():
+        df[column] = pd.Series(dtype=dtype)
+    return df
+
+
+def normalize_activity_frame(df):
+    """Coerce an activity DataFrame to the stored column order and dtypes"""
+    if df.empty:
+        return empty_activity_frame()
+    df = df[ACTIVITY_COLUMNS].copy()
+    df["date"] = pd.to_datetime(df["date"], format="ISO8601").astype("datetime64[ns]")
+    return df.astype(ACTIVITY_DTYPES)
+
+
+class ActivityStore:
+    """Per-user activity history: a compacted Parquet file plus an append-only journal
+
+    Logging a day appends one line to journal.csv. Once the journal holds
+    COMPACT_EVERY rows it is folded into history.parquet, so reads parse one
+    typed columnar file and a short tail instead of the whole history.
+    Appends and compaction hold a file lock on the directory, so workers in
+    other processes never append to a journal that is being folded away.
+    """
+
+    def __init__(self, directory, legacy_csv=None, compact_every=COMPACT_EVERY):
+        self.directory = directory
+        self.legacy_csv = legacy_csv
+        self.compact_every = compact_every
+        self.history_path = os.path.join(directory, "history.parquet")
+        self.journal_path = os.path.join(directory, "journal.csv")
+
+    def exists(self):
+        return os.path.isdir(self.directory)
+
+    def version(self):
+        """Identity of the stored files; changes whenever the history is appended to, compacted or reset"""
+        stamps = []
+        for path in (self.history_path, self.journal_path):
+            try:
+                stat = os.stat(path)
+                stamps.append((stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def _ensure_directory(self):
+        if self.exists():
+            return
+        os.makedirs(self.directory)
+        # First use for this user: carry over the old whole-file CSV log
+        if self.legacy_csv and os.path.exists(self.legacy_csv):
+            self._write_history(pd.read_csv(self.legacy_csv))
+
+    def _write_history(self, df):
+        tmp_path = self.history_path + ".tmp"
+        normalize_activity_frame(df).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.history_path)
+
+    def _journal_rows(self):
+        if not os.path.exists(self.journal_path):
+            return 0
+        with open(self.journal_path, 'r') as f:
+            return sum(1 for _ in f) - 1
+
+    def append(self, entry):
+        """Append one activity entry without rewriting the stored history"""
+        self._ensure_directory()
+        with cache_lock(self.directory):
+            new_journal = not os.path.exists(self.journal_path)
+            with open(self.journal_path, 'a') as f:
+                if new_journal:
+                    f.write(",".join(ACTIVITY_COLUMNS) + "\n")
+                f.write(f"{pd.Timestamp(entry['date']).strftime('%Y-%m-%d')},{int(entry['steps'])},"
+                        f"{int(entry['calories'])},{float(entry['sleep_hours'])}\n")
+
+            if self._journal_rows() >= self.compact_every:
+                self._compact()
+
+    def load(self):
+        """Load the full history as a typed DataFrame sorted by date"""
+        if not self.exists():
+            if self.legacy_csv and os.path.exists(self.legacy_csv):
+                self._ensure_directory()
+            else:
+                return empty_activity_frame()
+
+        parts = []
+        if os.path.exists(self.history_path):
+            parts.append(pd.read_parquet(self.history_path))
+        if os.path.exists(self.journal_path):
+            parts.append(normalize_activity_frame(pd.read_csv(self.journal_path)))
+        parts = [part for part in parts if not part.empty]
+        if not parts:
+            return empty_activity_frame()
+
+        df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+        # A crash between compaction steps can leave a day in both files
+        df = df.drop_duplicates("date", keep="last")
+        return df.sort_values("date", ignore_index=True)
+
+    def compact(self):
+        """Fold the journal into the Parquet history"""
+        if not self.exists():
+            return
+        with cache_lock(self.directory):
+            self._compact()
+
+    def _compact(self):
+        # Callers hold the directory lock, so no row can be appended between the fold and the removal
+        if not os.path.exists(self.journal_path):
+            return
+        self._write_history(self.load())
+        os.remove(self.journal_path)
+
+    def reset(self):
+        """Delete the stored history, including any legacy CSV"""
+        if self.exists():
+            shutil.rmtree(self.directory)
+        if self.legacy_csv and os.path.exists(self.legacy_csv):
+            os.remove(self.legacy_csv)
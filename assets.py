@@ -0,0 +1,33 @@
+import io
+import os
+
+from fitbit_cache import CACHE_DIR
+
+
+def prepare_image_asset(path, width, cache_dir=CACHE_DIR):
+    """JPEG bytes of an image scaled down to width, encoded once and reused from the cache directory"""
+    stat = os.stat(path)
+    name, _ = os.path.splitext(os.path.basename(path))
+    asset_path = os.path.join(cache_dir, "assets", f"{name}-{width}w-{stat.st_size}-{stat.st_mtime_ns}.jpg")
+    try:
+        with open(asset_path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    # PIL is only needed the first time an image is prepared
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image = image.convert("RGB")
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=90, optimize=True)
+
+    os.makedirs(os.path.dirname(asset_path), exist_ok=True)
+    tmp_path = f"{asset_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp_path, asset_path)
+    return buffer.getvalue()
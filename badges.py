@@ -0,0 +1,144 @@
+import json
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# Badges are awarded in this order. Rule types:
+#   count:         at least `threshold` logged days
+#   threshold:     any single day with `metric` >= `threshold`
+#   streak:        `days` consecutive logged days
+#   monthly_total: `metric` summed over one calendar month >= `threshold`
+BADGE_RULES = [
+    {"badge": "🥈 Step Champ", "type": "threshold", "metric": "steps", "threshold": 10000},
+    {"badge": "🥇 Sleeper Pro", "type": "threshold", "metric": "sleep_hours", "threshold": 8},
+    {"badge": "🥉 First Step", "type": "count", "threshold": 1},
+    {"badge": "🔥 Consistency", "type": "streak", "days": 7},
+    {"badge": "🌟 Unstoppable", "type": "streak", "days": 30},
+    {"badge": "🏔️ Monthly Mountain", "type": "monthly_total", "metric": "steps", "threshold": 300000},
+]
+
+TRACKED_METRICS = ["steps", "calories", "sleep_hours"]
+
+
+def empty_badge_state():
+    """Badge state for a user with no history"""
+    return {
+        "awarded": [],
+        "entries": 0,
+        "max": {metric: None for metric in TRACKED_METRICS},
+        "last_day": None,
+        "current_streak": 0,
+        "longest_streak": 0,
+        "monthly_totals": {},
+    }
+
+
+def _day_number(value):
+    return pd.Timestamp(value).date().toordinal()
+
+
+def _streaks(day_numbers):
+    """Return (longest, current) run of consecutive days using run-length encoding"""
+    days = np.unique(day_numbers)
+    if len(days) == 0:
+        return 0, 0
+    breaks = np.flatnonzero(np.diff(days) != 1)
+    starts = np.r_[0, breaks + 1]
+    ends = np.r_[breaks, len(days) - 1]
+    lengths = ends - starts + 1
+    return int(lengths.max()), int(lengths[-1])
+
+
+def _rule_met(rule, state, month=None):
+    kind = rule["type"]
+    if kind == "count":
+        return state["entries"] >= rule["threshold"]
+    if kind == "threshold":
+        best = state["max"].get(rule["metric"])
+        return best is not None and best >= rule["threshold"]
+    if kind == "streak":
+        return state["longest_streak"] >= rule["days"]
+    if kind == "monthly_total":
+        months = [month] if month else state["monthly_totals"]
+        return any(state["monthly_totals"].get(m, {}).get(rule["metric"], 0) >= rule["threshold"] for m in months)
+    raise ValueError(f"Unknown badge rule type: {kind}")
+
+
+def _award(state, rules, month=None):
+    awarded = set(state["awarded"])
+    new_badges = [rule["badge"] for rule in rules if rule["badge"] not in awarded and _rule_met(rule, state, month)]
+    state["awarded"].extend(new_badges)
+    return new_badges
+
+
+def evaluate_history(df, rules=BADGE_RULES, awarded=()):
+    """Build the badge state from a full activity history in one vectorized pass"""
+    state = empty_badge_state()
+    state["awarded"] = list(awarded)
+    if df.empty:
+        return state, []
+
+    days = pd.to_datetime(df["date"]).dt.normalize()
+    day_numbers = (days.to_numpy().astype("datetime64[D]").astype("int64")
+                   + date(1970, 1, 1).toordinal())
+    state["entries"] = int(len(df))
+    state["max"] = {metric: float(df[metric].max()) for metric in TRACKED_METRICS}
+    state["last_day"] = int(day_numbers.max())
+    state["longest_streak"], state["current_streak"] = _streaks(day_numbers)
+
+    monthly = df[TRACKED_METRICS].groupby(days.dt.strftime("%Y-%m")).sum()
+    state["monthly_totals"] = {month: {metric: float(v) for metric, v in row.items()} for month, row in monthly.iterrows()}
+
+    return state, _award(state, rules)
+
+
+def update_badge_state(state, entry, rules=BADGE_RULES, history_loader=None):
+    """Fold one new log entry into the state, returning (state, newly awarded badges)
+
+    Entries logged after the latest day update the counters in O(1). A
+    back-filled day can join two streaks, so the state is then rebuilt from
+    history_loader(), which must return the full history including entry.
+    """
+    day = _day_number(entry["date"])
+    last_day = state["last_day"]
+    if last_day is not None and day <= last_day and history_loader is not None:
+        return evaluate_history(history_loader(), rules, awarded=state["awarded"])
+
+    state["entries"] += 1
+    for metric in TRACKED_METRICS:
+        value = float(entry[metric])
+        best = state["max"].get(metric)
+        state["max"][metric] = value if best is None else max(best, value)
+
+    if last_day is not None and day == last_day + 1:
+        state["current_streak"] += 1
+    elif last_day is None or day > last_day:
+        state["current_streak"] = 1
+    state["longest_streak"] = max(state["longest_streak"], state["current_streak"])
+    state["last_day"] = day if last_day is None else max(last_day, day)
+
+    month = pd.Timestamp(entry["date"]).strftime("%Y-%m")
+    totals = state["monthly_totals"].setdefault(month, {metric: 0.0 for metric in TRACKED_METRICS})
+    for metric in TRACKED_METRICS:
+        totals[metric] = totals.get(metric, 0.0) + float(entry[metric])
+
+    return state, _award(state, rules, month)
+
+
+def read_badge_state(path):
+    """Read a persisted badge state, or None if there is none"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_badge_state(path, state):
+    """Persist the badge state atomically"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
@@ -0,0 +1,264 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from activity_store import ActivityStore
+from badges import evaluate_history, update_badge_state
+from bench_startup import measure_cold_start
+from fitbit_cache import build_fitbit_cache, load_fitbit_cache
+from population_stats import load_population_view
+from synthetic_data import write_population
+from user_store import SQLiteUserStore
+
+# Dataset sizes for each benchmark scale
+SCALES = {
+    "small": {"population_rows": 31, "history_days": 365, "accounts": 1000},
+    "medium": {"population_rows": 100_000, "history_days": 3650, "accounts": 10_000},
+    "large": {"population_rows": 2_000_000, "history_days": 3650, "accounts": 100_000},
+}
+
+# Days of data per synthetic population Id
+DAYS_PER_ID = 365
+
+# Benchmarks slower than this ratio against a previous result count as regressions
+REGRESSION_RATIO = 1.25
+
+BENCH_EMAIL = "bench@wellnest.test"
+BENCH_PASSWORD = "bench-password"
+
+PAGES = ["User Profile", "Activity Logger", "Health Insights", "Compare with Fitbit"]
+
+
+def write_fitbit_export(data_dir, rows, seed=42):
+    """Write a synthetic population of about rows daily records in the Fitbit export layout"""
+    days = min(rows, DAYS_PER_ID)
+    write_population(data_dir, users=-(-rows // days), days=days, seed=seed)
+
+
+def write_user_history(path, days, seed=7):
+    """Write days of daily history ending yesterday as a legacy per-user CSV"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end=pd.Timestamp.today().normalize() - pd.Timedelta(days=1), periods=days, freq="D")
+    pd.DataFrame({
+        "date": dates.strftime("%Y-%m-%d"),
+        "steps": np.clip(rng.normal(8500, 2500, days), 0, 30000).astype(int),
+        "calories": np.clip(rng.normal(2100, 300, days), 1200, 4000).astype(int),
+        "sleep_hours": np.round(np.clip(rng.normal(7.2, 1.0, days), 3, 12), 1),
+    }).to_csv(path, index=False)
+
+
+def user_history_filename(email):
+    """Legacy history CSV name the app looks up for an account, as in main.get_user_filename"""
+    return f"user_{email.replace('@', '_').replace('.', '_')}.csv"
+
+
+def bench_account(password_hash):
+    return {"password_hash": password_hash, "username": "bench", "age": 35, "height_cm": 175,
+            "weight_kg": 72.0, "bmi": 23.5, "registration_date": "2024-01-01"}
+
+
+def write_accounts(db_path, count):
+    """Fill a user store with count accounts plus the benchmark user"""
+    store = SQLiteUserStore(db_path)
+    password_hash = hashlib.sha256(BENCH_PASSWORD.encode()).hexdigest()
+    store.upsert_users({f"user{i}@wellnest.test": bench_account(password_hash) for i in range(count)})
+    store.create_user(BENCH_EMAIL, bench_account(password_hash))
+    store.set_meta("json_migrated", "bench")
+    return store
+
+
+def timed(fn, repeat=1):
+    """Median seconds of repeat calls to fn, and its last result"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)), result
+
+
+class BenchResults:
+    """Named timings collected by one benchmark run"""
+
+    def __init__(self):
+        self.results = []
+
+    def add(self, name, size, seconds, repeat=1):
+        self.results.append({"name": name, "size": size, "seconds": seconds, "repeat": repeat})
+        print(f"{name:<40} size={size:<10} {seconds * 1000:10.3f} ms")
+
+
+def run_data_benchmarks(results, work_dir, scale):
+    """Time the data layer functions the app calls, outside Streamlit"""
+    data_dir = os.path.join(work_dir, "data")
+    cache_dir = os.path.join(work_dir, "cache")
+    rows = scale["population_rows"]
+    write_fitbit_export(data_dir, rows)
+
+    seconds, version_dir = timed(lambda: build_fitbit_cache(data_dir, cache_dir))
+    results.add("fitbit_cache_build", rows, seconds)
+    seconds, frames = timed(lambda: load_fitbit_cache(data_dir, cache_dir), repeat=3)
+    results.add("load_fitbit_data_warm", rows, seconds, 3)
+    seconds, _ = timed(lambda: load_fitbit_cache(data_dir, cache_dir, zero_copy=True), repeat=3)
+    results.add("load_fitbit_data_zero_copy", rows, seconds, 3)
+    seconds, _ = timed(lambda: load_population_view(version_dir, *frames))
+    results.add("population_view_build", rows, seconds)
+    seconds, _ = timed(lambda: load_population_view(version_dir, *frames), repeat=3)
+    results.add("population_view_load", rows, seconds, 3)
+
+    days = scale["history_days"]
+    legacy_csv = os.path.join(work_dir, "history.csv")
+    write_user_history(legacy_csv, days)
+    store = ActivityStore(os.path.join(work_dir, "activity"), legacy_csv=legacy_csv)
+    seconds, history = timed(store.load)
+    results.add("activity_store_load_first", days, seconds)
+    seconds, history = timed(store.load, repeat=5)
+    results.add("activity_store_load", days, seconds, 5)
+
+    seconds, state = timed(lambda: evaluate_history(history)[0])
+    results.add("badges_evaluate_history", days, seconds)
+    entry = {"date": datetime.today().date(), "steps": 12000, "calories": 2500, "sleep_hours": 8.0}
+    seconds, _ = timed(lambda: store.append(entry))
+    results.add("activity_store_append", days, seconds)
+    seconds, _ = timed(lambda: update_badge_state(state, entry, history_loader=store.load))
+    results.add("badges_update_state", days, seconds)
+
+    accounts = scale["accounts"]
+    seconds, user_store = timed(lambda: write_accounts(os.path.join(work_dir, "users.db"), accounts))
+    results.add("user_store_bulk_insert", accounts, seconds)
+    emails = [f"user{i}@wellnest.test" for i in np.random.default_rng(0).integers(0, accounts, 1000)]
+    seconds, _ = timed(lambda: [user_store.get_user(email) for email in emails])
+    results.add("user_store_get_user", accounts, seconds / len(emails), len(emails))
+
+
+def run_app_benchmarks(results, work_dir, scale):
+    """Time logging in, every page and logging an activity through Streamlit's AppTest"""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    app_dir = os.path.join(work_dir, "app")
+    os.makedirs(app_dir)
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in os.listdir(here):
+        if name.endswith(".py") or name == "logo.jpg":
+            shutil.copy(os.path.join(here, name), app_dir)
+    write_fitbit_export(app_dir, scale["population_rows"])
+    write_user_history(os.path.join(app_dir, user_history_filename(BENCH_EMAIL)), scale["history_days"])
+    write_accounts(os.path.join(app_dir, "users.db"), scale["accounts"])
+
+    cwd = os.getcwd()
+    os.chdir(app_dir)
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    try:
+        app = AppTest.from_file(os.path.join(app_dir, "main.py"), default_timeout=600)
+        seconds, _ = timed(app.run)
+        results.add("app_login_screen", 0, seconds)
+
+        app.text_input[0].set_value(BENCH_EMAIL)
+        app.text_input[1].set_value(BENCH_PASSWORD)
+        next(b for b in app.button if b.label == "Login" and b.proto.is_form_submitter).click()
+        seconds, _ = timed(app.run)
+        if app.session_state.user is None:
+            raise RuntimeError("benchmark login failed")
+        # The pages are only worth timing against the full history
+        if len(app.session_state.activity_log) != scale["history_days"]:
+            raise RuntimeError(f"benchmark history not loaded: {len(app.session_state.activity_log)} of {scale['history_days']} days")
+        results.add("app_authenticate_user", scale["accounts"], seconds)
+
+        for page in PAGES:
+            size = scale["population_rows"] if page in ("Health Insights", "Compare with Fitbit") else scale["history_days"]
+            app.sidebar.radio[0].set_value(page)
+            seconds, _ = timed(app.run)
+            results.add(f"app_page_first[{page}]", size, seconds)
+            seconds, _ = timed(app.run, repeat=3)
+            results.add(f"app_page_warm[{page}]", size, seconds, 3)
+            if app.exception:
+                raise RuntimeError(f"{page}: {app.exception[0].value}")
+
+        app.sidebar.radio[0].set_value("Activity Logger").run()
+        app.number_input[0].set_value(12000)
+        next(b for b in app.button if b.label == "Log Activity").click()
+        seconds, _ = timed(app.run)
+        if len(app.session_state.activity_log) != scale["history_days"] + 1:
+            raise RuntimeError("benchmark activity was not logged")
+        results.add("app_log_activity_and_check_badges", scale["history_days"], seconds)
+    finally:
+        os.chdir(cwd)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current, previous, ratio=REGRESSION_RATIO):
+    """Benchmarks that got slower than ratio times their previous timing"""
+    before = {(r["name"], r["size"]): r["seconds"] for r in previous["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = before.get((result["name"], result["size"]))
+        if old and result["seconds"] > old * ratio:
+            regressions.append((result["name"], result["size"], old, result["seconds"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WellNest dashboard performance benchmarks")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--output", help="JSON results path (default bench_results/<scale>-<commit>.json)")
+    parser.add_argument("--compare", help="previous JSON results to check for regressions")
+    parser.add_argument("--skip-app", action="store_true", help="only run the data layer benchmarks")
+    args = parser.parse_args()
+
+    scale = SCALES[args.scale]
+    results = BenchResults()
+    work_dir = tempfile.mkdtemp(prefix="wellnest-bench-")
+    try:
+        run_data_benchmarks(results, work_dir, scale)
+        if not args.skip_app:
+            results.add("cold_start_login", 0, measure_cold_start()["seconds"])
+            run_app_benchmarks(results, work_dir, scale)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    commit = git_commit()
+    report = {
+        "scale": args.scale,
+        "sizes": scale,
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results.results,
+    }
+    output = args.output or os.path.join("bench_results", f"{args.scale}-{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare_results(report, json.load(f))
+        for name, size, old, new in regressions:
+            print(f"REGRESSION {name} (size {size}): {old * 1000:.1f} ms -> {new * 1000:.1f} ms")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
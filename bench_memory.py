@@ -0,0 +1,67 @@
+import argparse
+import json
+import sys
+
+import pandas as pd
+
+from fitbit_cache import CACHE_DIR, FITBIT_TABLES, build_fitbit_cache, load_fitbit_version, resolve_sources
+from fitbit_ingest import SOURCE_TABLES, normalize_chunk
+
+
+def frame_bytes(df):
+    """Memory held by a DataFrame, including its index and string contents"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def load_unpruned(data_dir="."):
+    """(merged_df, intensity_df, sleep_df) as the loader used to build them: every column, 64-bit types"""
+    paths = resolve_sources(data_dir)
+    tables = {}
+    for name, spec in SOURCE_TABLES.items():
+        path = paths[name]
+        raw = pd.read_excel(path) if path.endswith(".xlsx") else pd.read_csv(path)
+        wide = dict(spec, dtypes={column: "int64" if dtype.startswith("int") else "float64" for column, dtype in spec["dtypes"].items()})
+        tables[name] = normalize_chunk(raw, wide, None if path.endswith(".xlsx") else spec["date_format"])
+        if "sleep_hours" in tables[name]:
+            tables[name]["sleep_hours"] = tables[name]["sleep_hours"].astype("float64")
+    merged_df = pd.merge(tables["activity"], tables["sleep"][["Id", "date", "sleep_hours"]], on=["Id", "date"], how="left")
+    merged_df = merged_df[merged_df["sleep_hours"].notna() & (merged_df["sleep_hours"] > 0)].reset_index(drop=True)
+    return merged_df, tables["intensity"], tables["sleep"]
+
+
+def memory_report(data_dir=".", cache_dir=CACHE_DIR):
+    """Per-table columns and bytes before and after column pruning and downcasting"""
+    before = load_unpruned(data_dir)
+    after = load_fitbit_version(build_fitbit_cache(data_dir, cache_dir))
+    rows = []
+    for table, old, new in zip(FITBIT_TABLES, before, after):
+        rows.append({
+            "table": table,
+            "rows": len(new),
+            "columns_before": len(old.columns),
+            "columns_after": len(new.columns),
+            "bytes_before": frame_bytes(old),
+            "bytes_after": frame_bytes(new),
+            "dtypes_after": {column: str(dtype) for column, dtype in new.dtypes.items()},
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Population data memory footprint before and after column pruning")
+    parser.add_argument("data_dir", nargs="?", default=".")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = memory_report(args.data_dir, args.cache_dir)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        sys.exit(0)
+    total_before = sum(row["bytes_before"] for row in report)
+    total_after = sum(row["bytes_after"] for row in report)
+    for row in report:
+        print(f"{row['table']:<10} {row['rows']:>10,} rows  {row['columns_before']:>2} -> {row['columns_after']:>2} columns  "
+              f"{row['bytes_before'] / 1e6:9.2f} MB -> {row['bytes_after'] / 1e6:9.2f} MB")
+    print(f"{'total':<10} {total_before / 1e6:44.2f} MB -> {total_after / 1e6:9.2f} MB "
+          f"({total_before / max(total_after, 1):.1f}x smaller)")
@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+
+from startup_profile import import_timings
+
+# Seconds a fresh process may take to render the login screen
+COLD_START_BUDGET_SECONDS = float(os.getenv("WELLNEST_COLD_START_BUDGET", "2.0"))
+
+# Modules that must not be imported until a page or action needs them
+DEFERRED_MODULES = ["altair", "PIL", "smtplib", "email.mime"]
+
+# Runs in a fresh interpreter so nothing is already imported or cached
+COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=60).run()
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "exception": [str(e.value) for e in app.exception],
+    "loaded": [m for m in json.loads(sys.argv[2]) if m in sys.modules],
+}))
+"""
+
+
+def measure_cold_start(app_dir="."):
+    """Time a fresh process rendering the login screen, and list the deferred modules it imported"""
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_START_SCRIPT, os.path.abspath(os.path.join(app_dir, "main.py")), json.dumps(DEFERRED_MODULES)],
+        capture_output=True, text=True, cwd=app_dir, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def check_cold_start(app_dir=".", budget=COLD_START_BUDGET_SECONDS):
+    """Return a list of problems with the cold start (empty when within budget)"""
+    measured = measure_cold_start(app_dir)
+    problems = [f"login screen raised: {error}" for error in measured["exception"]]
+    if measured["seconds"] > budget:
+        problems.append(f"cold start took {measured['seconds']:.2f}s, budget is {budget:.2f}s")
+    if measured["loaded"]:
+        problems.append(f"imported before needed: {', '.join(measured['loaded'])}")
+    return measured, problems
+
+
+if __name__ == "__main__":
+    for module, seconds in import_timings(["streamlit", "numpy", "pandas", "altair", "PIL.Image", "smtplib", "email.mime.multipart"]):
+        print(f"import {module:<22} {'(already loaded)' if seconds is None else f'{seconds * 1000:8.1f} ms'}")
+
+    measured, problems = check_cold_start()
+    print(f"cold start (login screen): {measured['seconds']:.2f}s (budget {COLD_START_BUDGET_SECONDS:.2f}s)")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
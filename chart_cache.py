@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+
+# Chart specs kept per process before the least recently used are evicted
+MAX_CACHED_SPECS = 256
+
+# Owner used for charts that only depend on the population dataset
+POPULATION_OWNER = "population"
+
+
+def chart_to_spec(chart):
+    """Serialize an Altair chart to a Vega-Lite spec dict with its data inlined"""
+    spec = chart.to_dict()
+    # Altair's default theme pins a 300px view; Streamlit sizes charts itself
+    config = spec.get("config", {})
+    if config.get("view") == {"continuousWidth": 300, "continuousHeight": 300}:
+        del config["view"]
+        if not config:
+            del spec["config"]
+    return spec
+
+
+class ChartSpecCache:
+    """LRU cache of serialized chart specs keyed by (owner, data version, chart kind, viewport)"""
+
+    def __init__(self, max_entries=MAX_CACHED_SPECS):
+        self.max_entries = max_entries
+        self._specs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, owner, version, kind, build, **viewport):
+        """Return the cached spec, or build the chart with build() and cache its spec"""
+        key = (owner, version, kind, tuple(sorted(viewport.items())))
+        with self._lock:
+            spec = self._specs.get(key)
+            if spec is not None:
+                self._specs.move_to_end(key)
+                return spec
+
+        spec = chart_to_spec(build())
+        with self._lock:
+            self._specs[key] = spec
+            self._specs.move_to_end(key)
+            while len(self._specs) > self.max_entries:
+                self._specs.popitem(last=False)
+        return spec
+
+    def invalidate(self, owner):
+        """Drop every spec belonging to an owner (e.g. after their data changed)"""
+        with self._lock:
+            for key in [key for key in self._specs if key[0] == owner]:
+                del self._specs[key]
+
+    def __len__(self):
+        return len(self._specs)
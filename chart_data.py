@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Most points any one chart sends to the browser
+MAX_CHART_POINTS = int(os.getenv("WELLNEST_MAX_CHART_POINTS", "500"))
+
+# Bar chart bin widths tried in order until the bars fit
+DATE_BIN_FREQUENCIES = ["D", "W-MON", "MS", "QS", "YS"]
+DATE_BIN_DAYS = {"D": 1, "W-MON": 7, "MS": 30, "QS": 91, "YS": 365}
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[ns]").astype("int64").astype("float64")
+    return values.astype("float64")
+
+
+def lttb_indices(x, y, threshold):
+    """Row indices kept by Largest-Triangle-Three-Buckets downsampling (x must be sorted)"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x, y = _as_float(x), _as_float(y)
+    edges = (np.floor(np.arange(threshold - 1) * (n - 2) / (threshold - 2)) + 1).astype("int64")
+    edges[-1] = n - 1
+
+    selected = np.empty(threshold, dtype="int64")
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs((x[anchor] - avg_x) * (y[start:end] - y[anchor])
+                      - (x[anchor] - x[start:end]) * (avg_y - y[anchor]))
+        anchor = start + int(np.argmax(area))
+        selected[i + 1] = anchor
+    return selected
+
+
+def minmax_indices(y, max_points):
+    """Row indices of the minimum and maximum of each bucket, in original order"""
+    n = len(y)
+    if max_points >= n or max_points < 2:
+        return np.arange(n)
+
+    y = _as_float(y)
+    starts = np.linspace(0, n, max_points // 2, endpoint=False).astype("int64")
+    kept = []
+    for start, end in zip(starts, np.r_[starts[1:], n]):
+        bucket = y[start:end]
+        kept.extend((start + int(np.argmin(bucket)), start + int(np.argmax(bucket))))
+    return np.unique(kept)
+
+
+def downsample_line(df, x, y, max_points=MAX_CHART_POINTS):
+    """Reduce a line chart's rows with LTTB, keeping its visual shape"""
+    df = df.sort_values(x)
+    return df.iloc[lttb_indices(df[x].to_numpy(), df[y].to_numpy(), max_points)]
+
+
+def downsample_extremes(df, x, y, max_points=MAX_CHART_POINTS):
+    """Reduce area/scatter chart rows to each bucket's min and max, keeping peaks and troughs"""
+    df = df.sort_values(x)
+    return df.iloc[minmax_indices(df[y].to_numpy(), max_points)]
+
+
+def bin_by_date(df, x, y, max_bins=MAX_CHART_POINTS):
+    """Average a bar chart's values into the narrowest date bins that fit max_bins bars"""
+    if len(df) <= max_bins:
+        return df[[x, y]]
+
+    dates = pd.to_datetime(df[x])
+    span_days = max((dates.max() - dates.min()).days, 1)
+    freq = next((f for f in DATE_BIN_FREQUENCIES if span_days / DATE_BIN_DAYS[f] <= max_bins), DATE_BIN_FREQUENCIES[-1])
+    binned = df.assign(**{x: dates}).set_index(x)[y].resample(freq).mean().dropna()
+    return binned.reset_index()
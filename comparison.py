@@ -0,0 +1,85 @@
+import numpy as np
+
+# metric name -> (table, columns summed per row)
+COMPARISON_METRICS = {
+    "steps": ("merged", ["steps"]),
+    "calories": ("merged", ["calories"]),
+    "sleep_hours": ("merged", ["sleep_hours"]),
+    "active_minutes": ("intensity", ["FairlyActiveMinutes", "VeryActiveMinutes"]),
+    "very_active_minutes": ("intensity", ["VeryActiveMinutes"]),
+    "sedentary_minutes": ("intensity", ["SedentaryMinutes"]),
+}
+
+# Cohorts smaller than this are too noisy to rank against
+MIN_COHORT_SIZE = 5
+
+
+def _metric_frame(tables, table, columns):
+    df = tables.get(table)
+    if df is None or df.empty or not all(column in df for column in columns):
+        return None
+    frame = df[["Id"]].copy()
+    frame["value"] = df[columns].sum(axis=1, min_count=len(columns)).astype("float64")
+    frame = frame[frame["value"].notna()]
+    if columns == ["sleep_hours"]:
+        frame = frame[frame["value"] > 0]
+    return frame
+
+
+def build_comparison_index(merged_df, intensity_df, cohorts=None):
+    """Pre-sort every population distribution, overall and per cohort
+
+    cohorts is an optional DataFrame with an Id column plus one column per
+    bucketing (e.g. bmi_category); each distinct label gets its own sorted
+    array for every metric.
+    """
+    tables = {"merged": merged_df, "intensity": intensity_df}
+    index = {"all": {}, "cohorts": {}}
+
+    for metric, (table, columns) in COMPARISON_METRICS.items():
+        frame = _metric_frame(tables, table, columns)
+        if frame is None:
+            continue
+        index["all"][metric] = np.sort(frame["value"].to_numpy())
+
+        if cohorts is None:
+            continue
+        labelled = frame.merge(cohorts, on="Id", how="inner")
+        for bucketing in cohorts.columns.drop("Id"):
+            buckets = index["cohorts"].setdefault(bucketing, {})
+            for label, values in labelled.groupby(bucketing)["value"]:
+                buckets.setdefault(label, {})[metric] = np.sort(values.to_numpy())
+
+    return index
+
+
+def population_array(index, metric, cohort=None):
+    """Sorted population values for a metric, optionally within a (bucketing, label) cohort"""
+    if cohort is None:
+        return index["all"].get(metric)
+    bucketing, label = cohort
+    return index["cohorts"].get(bucketing, {}).get(label, {}).get(metric)
+
+
+def percentile_rank(index, metric, values, cohort=None):
+    """Percentage of the population at or below each value (ties count half)
+
+    Accepts a scalar or an array of values; returns NaN when the metric or
+    cohort has too little data to rank against.
+    """
+    population = population_array(index, metric, cohort)
+    values = np.asarray(values, dtype="float64")
+    if population is None or len(population) < (MIN_COHORT_SIZE if cohort else 1):
+        return np.full(values.shape, np.nan) if values.ndim else float("nan")
+
+    below = np.searchsorted(population, values, side="left")
+    at_or_below = np.searchsorted(population, values, side="right")
+    ranks = (below + at_or_below) / 2 / len(population) * 100
+    return ranks if values.ndim else float(ranks)
+
+
+def ordinal(n):
+    """Format an integer as 1st, 2nd, 3rd, 4th, ..."""
+    n = int(n)
+    suffix = "th" if 10 <= n % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+
+import pyarrow as pa
+
+from fitbit_ingest import ACTIVITY_DAILY_FILE, OUTPUT_TABLES, arrow_table, ingest_fitbit_sources
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not coordinated across processes
+    fcntl = None
+
+# Point every worker at the same directory to share one copy of the cache
+CACHE_DIR = os.getenv("WELLNEST_CACHE_DIR", ".wellnest_cache")
+
+# Each table is read from the first source file that exists
+FITBIT_SOURCES = {
+    "activity": ["dailyActivity_merged.csv"],
+    "intensity": ["dailyIntensities_merged.csv"],
+    "sleep": ["sleepDay_merged.csv", "sleepDay_merged.xlsx"],
+}
+
+FITBIT_TABLES = OUTPUT_TABLES
+
+# Bumped whenever the cached file layout changes, so older caches are rebuilt
+CACHE_LAYOUT = 4
+
+
+def resolve_sources(data_dir="."):
+    """Return the source file path used for each Fitbit table"""
+    paths = {}
+    for name, candidates in FITBIT_SOURCES.items():
+        for candidate in candidates:
+            path = os.path.join(data_dir, candidate)
+            if os.path.exists(path):
+                paths[name] = path
+                break
+        else:
+            raise FileNotFoundError(f"No source file found for {name}: {', '.join(candidates)}")
+    return paths
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_state(paths, cache_dir=CACHE_DIR):
+    """Size, mtime and hash of each source file, reusing earlier hashes for files whose size and mtime are unchanged"""
+    manifest_path = os.path.join(cache_dir, "sources.json")
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    state = {}
+    changed = False
+    for name in sorted(paths):
+        path = paths[name]
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        entry = manifest.get(key)
+        if not entry or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": _hash_file(path)}
+            manifest[key] = entry
+            changed = True
+        state[name] = dict(entry, file=os.path.basename(path))
+
+    if changed:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    return state
+
+
+def state_fingerprint(state):
+    """Short hash identifying a dataset version from its source state"""
+    digest = hashlib.sha256(f"layout:{CACHE_LAYOUT}\n".encode())
+    for name in sorted(state):
+        digest.update(f"{name}:{state[name]['file']}:{state[name]['sha256']}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def source_fingerprint(paths, cache_dir=CACHE_DIR):
+    """Hash the source files into a dataset version"""
+    return state_fingerprint(source_state(paths, cache_dir))
+
+
+def read_version_sources(version_dir):
+    """Source state a cached version was built from, or None if unknown or built with another layout"""
+    try:
+        with open(os.path.join(version_dir, "sources.json"), 'r') as f:
+            recorded = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return recorded["sources"] if recorded.get("layout") == CACHE_LAYOUT else None
+
+
+def latest_version(cache_dir=CACHE_DIR):
+    """The most recently built version directory in the cache, if any"""
+    if not os.path.isdir(cache_dir):
+        return None
+    versions = [os.path.join(cache_dir, entry) for entry in os.listdir(cache_dir)
+                if entry.startswith("fitbit-") and not entry.endswith(".tmp")]
+    return max(versions, key=os.path.getmtime, default=None)
+
+
+@contextmanager
+def cache_lock(directory):
+    """Hold an exclusive lock on an existing cache directory while building into it
+
+    The directory is never created here, so a version pruned by a newer
+    build is not brought back by a worker still serving it.
+    """
+    with open(os.path.join(directory, ".lock"), 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_or_build(directory, read, build, save, errors=(OSError,)):
+    """Read what was saved for a dataset version, or build and save it once across workers
+
+    read() raises one of errors while nothing is saved; build() computes
+    the value and save(value) materializes it into directory. Once a newer
+    build has pruned the version, the value is built but not saved.
+    """
+    try:
+        return read()
+    except errors:
+        pass
+
+    value = None
+    try:
+        with cache_lock(directory):
+            try:
+                # Another worker may have saved it while this one waited for the lock
+                return read()
+            except errors:
+                value = build()
+                save(value)
+                return value
+    except FileNotFoundError:
+        if os.path.isdir(directory):
+            raise
+        return build() if value is None else value
+
+
+def write_arrow(df, path):
+    """Write a DataFrame as an Arrow IPC file that can be memory-mapped without copying"""
+    table = arrow_table(df)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_partitions(directory, zero_copy=False):
+    """Read a table written as part-NNNNN.arrow files into one DataFrame
+
+    A single partition keeps read_arrow's zero-copy mapping; several are
+    concatenated, which copies them.
+    """
+    parts = sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".arrow"))
+    if len(parts) == 1:
+        return read_arrow(parts[0], zero_copy)
+    tables = []
+    for part in parts:
+        with pa.memory_map(part, 'r') as source:
+            tables.append(pa.ipc.open_file(source).read_all())
+    return pa.concat_tables(tables).to_pandas()
+
+
+def read_arrow(path, zero_copy=False):
+    """Read an Arrow IPC file through a memory map
+
+    With zero_copy the DataFrame's (read-only) columns point straight into
+    the mapped file, so every process reading it shares the same pages.
+    Columns that cannot be mapped, such as strings, are copied as usual.
+    """
+    with pa.memory_map(path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    if not zero_copy:
+        return table.to_pandas()
+    try:
+        return table.to_pandas(split_blocks=True, zero_copy_only=True)
+    except pa.ArrowInvalid:
+        return table.to_pandas(split_blocks=True)
+
+
+def build_fitbit_cache(data_dir=".", cache_dir=CACHE_DIR):
+    """Ingest the Fitbit sources once and store the result as partitioned Arrow IPC files"""
+    paths = resolve_sources(data_dir)
+    state = source_state(paths, cache_dir)
+    version_dir = os.path.join(cache_dir, f"fitbit-{state_fingerprint(state)}")
+    if os.path.isdir(version_dir):
+        return version_dir
+
+    # Replicas starting together wait here for whichever one builds first
+    os.makedirs(cache_dir, exist_ok=True)
+    with cache_lock(cache_dir):
+        if os.path.isdir(version_dir):
+            return version_dir
+
+        from fitbit_refresh import refresh_from_previous
+
+        tmp_dir = f"{version_dir}.{os.getpid()}.tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        # Sources that only gained rows since the last version are folded in incrementally
+        previous_dir = latest_version(cache_dir)
+        if previous_dir is None or not refresh_from_previous(previous_dir, paths, state, tmp_dir, os.path.basename(version_dir)):
+            ingest_fitbit_sources(paths, tmp_dir)
+        with open(os.path.join(tmp_dir, "sources.json"), 'w') as f:
+            json.dump({"layout": CACHE_LAYOUT, "sources": state}, f, indent=2)
+        os.rename(tmp_dir, version_dir)
+
+        # Workers still mapping an old version keep reading it after the unlink
+        for entry in os.listdir(cache_dir):
+            if entry.startswith("fitbit-") and entry != os.path.basename(version_dir) and not entry.endswith(".tmp"):
+                shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+    return version_dir
+
+
+def load_fitbit_version(version_dir, zero_copy=False):
+    """Load (merged_df, intensity_df, sleep_df) of one cached dataset version"""
+    return tuple(read_partitions(os.path.join(version_dir, name), zero_copy) for name in FITBIT_TABLES)
+
+
+def read_activity_daily(version_dir, zero_copy=False):
+    """Per-date sums and counts of every activity row of a cached dataset version, indexed by date"""
+    return read_arrow(os.path.join(version_dir, ACTIVITY_DAILY_FILE), zero_copy).set_index("date")
+
+
+def load_fitbit_cache(data_dir=".", cache_dir=CACHE_DIR, zero_copy=False):
+    """Load (merged_df, intensity_df, sleep_df) from the cache, building it if the sources changed"""
+    return load_fitbit_version(build_fitbit_cache(data_dir, cache_dir), zero_copy)
+
+
+if __name__ == "__main__":
+    # Run before starting replicas so new workers attach to a ready cache instead of building it
+    from intensity_stats import load_intensity_view
+    from population_index import load_population_index
+    from population_stats import load_population_view
+
+    start = time.perf_counter()
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "."
+    built = build_fitbit_cache(data_dir)
+    merged_df, intensity_df, sleep_df = load_fitbit_version(built)
+    load_population_view(built, merged_df, intensity_df, sleep_df)
+    load_intensity_view(built, intensity_df)
+    load_population_index(built, merged_df)
+    print(f"Fitbit cache, population view, intensity rollups and population index ready at {built} ({time.perf_counter() - start:.2f}s)")
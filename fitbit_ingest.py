@@ -0,0 +1,284 @@
+import math
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Rows parsed per CSV chunk
+CHUNK_ROWS = 250_000
+
+# Source bytes per Id partition; each partition is joined in memory on its own
+PARTITION_BYTES = 64 * 1024 * 1024
+
+# Full schema and fixed date format of each Fitbit export table, with counts and minutes as
+# int32 and distances as float32; only the columns some feature needs are read (see INGEST_TABLES)
+SOURCE_TABLES = {
+    "activity": {
+        "date_column": "ActivityDate",
+        "date_format": "%m/%d/%Y",
+        "rename": {"TotalSteps": "steps", "Calories": "calories"},
+        "dtypes": {
+            "Id": "int64", "TotalSteps": "int32", "TotalDistance": "float32", "TrackerDistance": "float32",
+            "LoggedActivitiesDistance": "float32", "VeryActiveDistance": "float32", "ModeratelyActiveDistance": "float32",
+            "LightActiveDistance": "float32", "SedentaryActiveDistance": "float32", "VeryActiveMinutes": "int32",
+            "FairlyActiveMinutes": "int32", "LightlyActiveMinutes": "int32", "SedentaryMinutes": "int32", "Calories": "int32",
+        },
+    },
+    "intensity": {
+        "date_column": "ActivityDay",
+        "date_format": "%m/%d/%Y",
+        "rename": {},
+        "dtypes": {
+            "Id": "int64", "SedentaryMinutes": "int32", "LightlyActiveMinutes": "int32", "FairlyActiveMinutes": "int32",
+            "VeryActiveMinutes": "int32", "SedentaryActiveDistance": "float32", "LightActiveDistance": "float32",
+            "ModeratelyActiveDistance": "float32", "VeryActiveDistance": "float32",
+        },
+    },
+    "sleep": {
+        "date_column": "SleepDay",
+        "date_format": "%m/%d/%Y %I:%M:%S %p",
+        "rename": {},
+        "dtypes": {"Id": "int64", "TotalSleepRecords": "int32", "TotalMinutesAsleep": "int32", "TotalTimeInBed": "int32"},
+    },
+}
+
+# Columns each feature reads from the output tables, besides Id and date
+FEATURE_COLUMNS = {
+    "activity/sleep join": {"sleep": ["sleep_hours"]},
+    "population view": {
+        "merged": ["steps", "calories", "sleep_hours"],
+        "intensity": ["SedentaryMinutes", "LightlyActiveMinutes", "FairlyActiveMinutes", "VeryActiveMinutes"],
+        "sleep": ["sleep_hours", "TotalMinutesAsleep", "TotalTimeInBed"],
+    },
+    "comparison index": {
+        "merged": ["steps", "calories", "sleep_hours"],
+        "intensity": ["SedentaryMinutes", "FairlyActiveMinutes", "VeryActiveMinutes"],
+    },
+    "intensity analytics": {"intensity": ["SedentaryMinutes", "LightlyActiveMinutes", "FairlyActiveMinutes", "VeryActiveMinutes"]},
+    "population charts": {"merged": ["steps"], "sleep": ["sleep_hours"]},
+    "population index": {"merged": ["steps", "calories", "sleep_hours"]},
+}
+
+# Output table each source feeds (merged is activity joined with sleep_hours)
+SOURCE_OUTPUTS = {"activity": "merged", "intensity": "intensity", "sleep": "sleep"}
+
+# Columns computed during ingestion -> the source column they come from
+DERIVED_COLUMNS = {"sleep_hours": "TotalMinutesAsleep"}
+
+# Output tables, each written as one Arrow file per partition
+OUTPUT_TABLES = ["merged", "intensity", "sleep"]
+
+# Activity columns summed per date over every activity row, named as in daily_health_averages.csv;
+# merged only keeps the days with sleep logged, so daily averages cannot come from it
+DAILY_ACTIVITY_COLUMNS = {"TotalSteps": "steps", "Calories": "calories"}
+
+# Per-date sums and counts of DAILY_ACTIVITY_COLUMNS, written next to the output tables
+ACTIVITY_DAILY_FILE = "activity_daily.arrow"
+
+
+def feature_columns(table):
+    """Columns of an output table that at least one feature reads"""
+    columns = []
+    for tables in FEATURE_COLUMNS.values():
+        columns += [column for column in tables.get(table, []) if column not in columns]
+    return columns
+
+
+def _pruned_spec(name, spec):
+    needed = set(feature_columns(SOURCE_OUTPUTS[name]))
+    needed |= {source for derived, source in DERIVED_COLUMNS.items() if derived in needed}
+    dtypes = {column: dtype for column, dtype in spec["dtypes"].items()
+              if column == "Id" or spec["rename"].get(column, column) in needed}
+    return dict(spec, dtypes=dtypes)
+
+
+# The source schemas pruned to the columns features need; the only columns parsed and cached
+INGEST_TABLES = {name: _pruned_spec(name, spec) for name, spec in SOURCE_TABLES.items()}
+
+
+def arrow_table(df):
+    """Arrow table of a DataFrame, keeping NaN as a float value so the columns map without copying
+
+    Categorical columns are dictionary-encoded with int32 indices, so
+    partitions with different categories still concatenate.
+    """
+    columns = {}
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            values = df[column].array
+            columns[column] = pa.DictionaryArray.from_arrays(values.codes.astype("int32"), pa.array(values.categories.to_numpy()))
+            continue
+        values = df[column].to_numpy()
+        columns[column] = pa.array(values, from_pandas=values.dtype == object)
+    return pa.table(columns)
+
+
+def categorical_ids(df):
+    """The frame with Id as a categorical, as the cached tables store it"""
+    return df.assign(Id=pd.Categorical(df["Id"].to_numpy()))
+
+
+def daily_activity_sums(activity_df):
+    """Per-date sums and counts of the daily activity columns, indexed by date"""
+    if activity_df is None or activity_df.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="date"))
+    values = activity_df[list(DAILY_ACTIVITY_COLUMNS.values())].astype("float64")
+    values.columns = list(DAILY_ACTIVITY_COLUMNS)
+    grouped = values.groupby(activity_df["date"].dt.normalize().rename("date")).agg(["sum", "count"])
+    grouped.columns = [f"{name}_{stat}" for name, stat in grouped.columns]
+    return grouped
+
+
+def add_sums(current, delta):
+    """Add two frames of sums and counts, keeping the keys only one side has"""
+    if current.empty:
+        return delta
+    if delta.empty:
+        return current
+    return current.add(delta, fill_value=0)
+
+
+def _write_arrow_file(df, path):
+    with pa.OSFile(path, 'wb') as sink:
+        arrow = arrow_table(df)
+        with pa.ipc.new_file(sink, arrow.schema) as writer:
+            writer.write_table(arrow)
+
+
+def weekdays(days):
+    """Day of the week (Monday = 0) of datetime64[D] dates or integer days since the epoch"""
+    # 1970-01-01 was a Thursday
+    return (np.asarray(days).astype("int64") + 3) % 7
+
+
+def parse_dates(values, date_format):
+    """Parse date strings with a fixed format, once per distinct string"""
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Index(uniques), format=date_format).to_numpy()
+    return parsed[codes]
+
+
+def normalize_chunk(chunk, spec, date_format):
+    """Apply a table's schema to a raw chunk: typed columns, a parsed date column and app column names"""
+    dates = chunk[spec["date_column"]]
+    if date_format is None:
+        dates = pd.to_datetime(dates).to_numpy()
+    else:
+        dates = parse_dates(dates.to_numpy(dtype=object), date_format)
+    columns = {"Id": chunk["Id"].to_numpy(), "date": dates}
+    for column in spec["dtypes"]:
+        if column != "Id" and column in chunk:
+            columns[spec["rename"].get(column, column)] = chunk[column].to_numpy(dtype=spec["dtypes"][column])
+    df = pd.DataFrame(columns)
+    if "TotalMinutesAsleep" in df:
+        df["sleep_hours"] = (df["TotalMinutesAsleep"] / 60).astype("float32")
+    return df
+
+
+def read_source_chunks(path, spec, chunk_rows=CHUNK_ROWS, offset=0):
+    """Yield normalized chunks of one Fitbit export file, starting at byte offset of a CSV"""
+    if path.endswith(".xlsx"):
+        # Excel sheets cannot be streamed, and their dates are already typed
+        yield normalize_chunk(pd.read_excel(path), spec, None)
+        return
+
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = {column: dtype for column, dtype in spec["dtypes"].items() if column in header}
+    dtypes[spec["date_column"]] = "str"
+    with open(path, 'rb') as f:
+        if offset:
+            f.seek(offset)
+        options = {"names": list(header), "header": None} if offset else {}
+        for chunk in pd.read_csv(f, usecols=list(dtypes), dtype=dtypes, chunksize=chunk_rows, **options):
+            yield normalize_chunk(chunk, spec, spec["date_format"])
+
+
+class _PartitionSpill:
+    """Append-only Arrow stream files holding one source table's rows, split by Id partition"""
+
+    def __init__(self, directory, partitions):
+        self.directory = directory
+        self.partitions = partitions
+        self._writers = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, partition):
+        return os.path.join(self.directory, f"part-{partition:05d}.arrows")
+
+    def write(self, df):
+        keys = df["Id"].to_numpy() % self.partitions
+        for partition in np.unique(keys):
+            table = arrow_table(df[keys == partition])
+            if partition not in self._writers:
+                self._writers[partition] = pa.ipc.new_stream(self._path(partition), table.schema)
+            self._writers[partition].write_table(table)
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+
+    def read(self, partition, empty):
+        if partition not in self._writers:
+            return empty
+        with pa.memory_map(self._path(partition), 'r') as source:
+            return pa.ipc.open_stream(source).read_all().to_pandas()
+
+
+def partition_count(paths, partition_bytes=PARTITION_BYTES):
+    """Number of Id partitions needed to keep each one near partition_bytes of source data"""
+    total = sum(os.path.getsize(path) for path in paths.values())
+    return max(1, math.ceil(total / partition_bytes))
+
+
+def join_partition(activity_df, intensity_df, sleep_df):
+    """Join one partition's activity with its logged sleep on (Id, date)"""
+    merged_df = pd.merge(activity_df, sleep_df[["Id", "date", "sleep_hours"]], on=["Id", "date"], how="left")
+    merged_df = merged_df[merged_df["sleep_hours"].notna() & (merged_df["sleep_hours"] > 0)]
+    return merged_df.reset_index(drop=True), intensity_df, sleep_df
+
+
+def empty_frame(spec):
+    """Zero-row frame with a table's normalized columns"""
+    columns = {"Id": np.array([], dtype="int64"), "date": np.array([], dtype="datetime64[us]")}
+    for column, dtype in spec["dtypes"].items():
+        if column != "Id":
+            columns[spec["rename"].get(column, column)] = np.array([], dtype=dtype)
+    if "TotalMinutesAsleep" in spec["dtypes"]:
+        columns["sleep_hours"] = np.array([], dtype="float32")
+    return pd.DataFrame(columns)
+
+
+def ingest_fitbit_sources(paths, out_dir, chunk_rows=CHUNK_ROWS, partition_bytes=PARTITION_BYTES):
+    """Stream the Fitbit exports into Id-partitioned Arrow files under out_dir
+
+    Sources are read in chunks and spilled to disk by Id partition, then
+    each partition is joined on its own, so peak memory depends on the
+    partition size rather than the size of the export. Writes
+    out_dir/<table>/part-NNNNN.arrow for each of OUTPUT_TABLES, plus the
+    per-date activity sums in out_dir/ACTIVITY_DAILY_FILE.
+    """
+    partitions = partition_count(paths, partition_bytes)
+    spill_dir = os.path.join(out_dir, ".spill")
+    spills = {}
+    activity_daily = daily_activity_sums(None)
+    try:
+        for name, spec in INGEST_TABLES.items():
+            spills[name] = _PartitionSpill(os.path.join(spill_dir, name), partitions)
+            for chunk in read_source_chunks(paths[name], spec, chunk_rows):
+                spills[name].write(chunk)
+                if name == "activity":
+                    activity_daily = add_sums(activity_daily, daily_activity_sums(chunk))
+            spills[name].close()
+        _write_arrow_file(activity_daily.reset_index(), os.path.join(out_dir, ACTIVITY_DAILY_FILE))
+
+        for table in OUTPUT_TABLES:
+            os.makedirs(os.path.join(out_dir, table), exist_ok=True)
+        for partition in range(partitions):
+            frames = join_partition(*(spills[name].read(partition, empty_frame(spec)) for name, spec in INGEST_TABLES.items()))
+            for table, df in zip(OUTPUT_TABLES, frames):
+                _write_arrow_file(categorical_ids(df), os.path.join(out_dir, table, f"part-{partition:05d}.arrow"))
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+    return partitions
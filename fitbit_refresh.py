@@ -0,0 +1,195 @@
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from fitbit_cache import (CACHE_DIR, FITBIT_TABLES, build_fitbit_cache, load_fitbit_version, read_activity_daily,
+                          read_version_sources, write_arrow)
+from fitbit_ingest import (ACTIVITY_DAILY_FILE, INGEST_TABLES, add_sums, categorical_ids, daily_activity_sums, empty_frame,
+                           join_partition, read_source_chunks)
+from intensity_stats import load_intensity_view, read_intensity_view, save_intensity_view, update_intensity_view
+from population_index import load_population_index, read_population_index_rows, save_population_index, update_population_index
+from population_stats import load_population_view, read_population_view, save_population_view, update_population_view
+
+# Seconds between checks of the source files in watch mode
+WATCH_INTERVAL = 60
+
+
+def _hash_prefix(path, size):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while size > 0:
+            block = f.read(min(1 << 20, size))
+            if not block:
+                break
+            digest.update(block)
+            size -= len(block)
+    return digest.hexdigest()
+
+
+def appended_offset(path, previous, current):
+    """Byte offset where rows appended since the previous state begin, or None if the file changed otherwise"""
+    if current["file"] != previous["file"]:
+        return None
+    if current["sha256"] == previous["sha256"]:
+        return current["size"]
+    if not path.endswith(".csv") or current["size"] <= previous["size"]:
+        return None
+    # Appended rows start on a fresh line after bytes that are exactly the previous file
+    with open(path, 'rb') as f:
+        f.seek(previous["size"] - 1)
+        if f.read(1) != b"\n":
+            return None
+    if _hash_prefix(path, previous["size"]) != previous["sha256"]:
+        return None
+    return previous["size"]
+
+
+def _keys(df):
+    """One int64 per (Id, day) row"""
+    days = df["date"].to_numpy().astype("datetime64[D]").astype("int64")
+    return df["Id"].to_numpy() * 100_000 + days
+
+
+def _new_rows(df, existing_keys):
+    """Rows of df for (Id, day) pairs not in existing_keys, each pair kept once"""
+    keys = pd.Series(_keys(df))
+    keep = ~keys.isin(existing_keys).to_numpy() & ~keys.duplicated().to_numpy()
+    return df[keep].reset_index(drop=True)
+
+
+def read_appended(path, spec, offset):
+    """Normalized rows of a CSV from offset on"""
+    if offset >= os.path.getsize(path):
+        return empty_frame(spec)
+    chunks = list(read_source_chunks(path, spec, offset=offset))
+    return pd.concat(chunks, ignore_index=True) if chunks else empty_frame(spec)
+
+
+def _activity_rows(path, keys):
+    """Activity rows of the whole export for the given (Id, day) keys"""
+    spec = INGEST_TABLES["activity"]
+    rows = [chunk[pd.Series(_keys(chunk)).isin(keys).to_numpy()] for chunk in read_source_chunks(path, spec)]
+    return pd.concat(rows, ignore_index=True) if rows else empty_frame(spec)
+
+
+def _link_parts(previous_dir, out_dir, table):
+    """Hard-link a table's partitions into out_dir; returns the next free part number"""
+    os.makedirs(os.path.join(out_dir, table), exist_ok=True)
+    parts = sorted(name for name in os.listdir(os.path.join(previous_dir, table)) if name.endswith(".arrow"))
+    for name in parts:
+        source, target = os.path.join(previous_dir, table, name), os.path.join(out_dir, table, name)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+    return int(parts[-1][len("part-"):-len(".arrow")]) + 1 if parts else 0
+
+
+def refresh_from_previous(previous_dir, paths, state, out_dir, version):
+    """Build a version in out_dir from previous_dir plus the rows appended to the sources since
+
+    Only CSV sources that grew by whole rows qualify; anything else returns
+    False so the caller falls back to a full ingest. The previous version's
+    partitions are hard-linked and the new rows land in one extra partition
+    per table. Rows for (Id, day) pairs already cached are skipped, and the
+    saved population view, intensity rollups and population index are
+    updated with the new rows instead of being recomputed.
+    """
+    previous = read_version_sources(previous_dir)
+    if previous is None or set(previous) != set(state):
+        return False
+    offsets = {}
+    for name, path in paths.items():
+        offsets[name] = appended_offset(path, previous[name], state[name])
+        if offsets[name] is None:
+            return False
+
+    old_merged, old_intensity, old_sleep = load_fitbit_version(previous_dir, zero_copy=True)
+    appended_activity = read_appended(paths["activity"], INGEST_TABLES["activity"], offsets["activity"])
+    new_activity = _new_rows(appended_activity, _keys(old_merged))
+    new_intensity = _new_rows(read_appended(paths["intensity"], INGEST_TABLES["intensity"], offsets["intensity"]), _keys(old_intensity))
+    new_sleep = _new_rows(read_appended(paths["sleep"], INGEST_TABLES["sleep"], offsets["sleep"]), _keys(old_sleep))
+
+    # New activity joins old and new sleep; new sleep also completes days whose activity was already cached
+    activity_keys = _keys(new_activity)
+    late_sleep_keys = np.setdiff1d(_keys(new_sleep), activity_keys)
+    activity_rows = [new_activity]
+    if len(late_sleep_keys):
+        activity_rows.append(_activity_rows(paths["activity"], late_sleep_keys))
+    old_sleep_rows = old_sleep[pd.Series(_keys(old_sleep)).isin(activity_keys).to_numpy()].astype({"Id": "int64"})
+    sleep_rows = pd.concat([old_sleep_rows, new_sleep], ignore_index=True)
+    merged_delta = join_partition(pd.concat(activity_rows, ignore_index=True), new_intensity, sleep_rows)[0]
+
+    for table, delta in zip(FITBIT_TABLES, (merged_delta, new_intensity, new_sleep)):
+        next_part = _link_parts(previous_dir, out_dir, table)
+        if not delta.empty:
+            write_arrow(categorical_ids(delta), os.path.join(out_dir, table, f"part-{next_part:05d}.arrow"))
+    # Daily activity averages count every activity row, as a full ingest does, not just the joined ones
+    activity_daily_delta = daily_activity_sums(appended_activity)
+    write_arrow(add_sums(read_activity_daily(previous_dir), activity_daily_delta).reset_index(),
+                os.path.join(out_dir, ACTIVITY_DAILY_FILE))
+
+    # Aggregates the previous version never saved are computed on first use of the new one instead
+    try:
+        view = read_population_view(previous_dir)
+    except (OSError, ValueError, KeyError):
+        pass
+    else:
+        save_population_view(update_population_view(view, merged_delta, new_intensity, new_sleep, version=version,
+                                                   activity_daily_delta=activity_daily_delta), out_dir)
+    try:
+        intensity_view = read_intensity_view(previous_dir)
+    except OSError:
+        pass
+    else:
+        save_intensity_view(update_intensity_view(intensity_view, new_intensity, version=version), out_dir)
+    try:
+        index_rows = read_population_index_rows(previous_dir)
+    except OSError:
+        pass
+    else:
+        save_population_index(update_population_index(index_rows, merged_delta), out_dir)
+    return True
+
+
+def watch(data_dir=".", cache_dir=CACHE_DIR, interval=WATCH_INTERVAL):
+    """Refresh the cache whenever the source files change; running apps pick up each new version"""
+    version_dir = None
+    while True:
+        try:
+            current = build_fitbit_cache(data_dir, cache_dir)
+        except FileNotFoundError as e:
+            print(f"Waiting for sources: {e}")
+        else:
+            if current != version_dir:
+                merged_df, intensity_df, sleep_df = load_fitbit_version(current)
+                load_population_view(current, merged_df, intensity_df, sleep_df)
+                load_intensity_view(current, intensity_df)
+                load_population_index(current, merged_df)
+                print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} serving {current}")
+                version_dir = current
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the Fitbit cache from changed source files")
+    parser.add_argument("data_dir", nargs="?", default=".")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--watch", action="store_true", help="keep polling the sources for changes")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL)
+    args = parser.parse_args()
+
+    if args.watch:
+        try:
+            watch(args.data_dir, args.cache_dir, args.interval)
+        except KeyboardInterrupt:
+            sys.exit(0)
+    start = time.perf_counter()
+    version_dir = build_fitbit_cache(args.data_dir, args.cache_dir)
+    print(f"Fitbit cache at {version_dir} ({time.perf_counter() - start:.2f}s)")
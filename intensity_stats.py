@@ -0,0 +1,125 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from fitbit_cache import load_or_build, read_arrow, write_arrow
+from fitbit_ingest import weekdays
+
+INTENSITY_COLUMNS = ["SedentaryMinutes", "LightlyActiveMinutes", "FairlyActiveMinutes", "VeryActiveMinutes"]
+
+# WHO: at least 150 minutes of moderate activity a week, a vigorous minute counting as two
+WHO_WEEKLY_MINUTES = 150
+VIGOROUS_WEIGHT = 2
+
+# Per-Id weekly averages ranked by percentile_rank
+INTENSITY_METRICS = INTENSITY_COLUMNS + ["moderate_equivalent"]
+
+
+def _week_starts(dates):
+    """Monday of each date's week"""
+    days = np.asarray(dates).astype("datetime64[D]")
+    return days - weekdays(days)
+
+
+def weekly_rollups(intensity_df):
+    """Minutes per (Id, week) for each intensity, plus days logged and WHO moderate-equivalent minutes"""
+    if intensity_df is None or intensity_df.empty or not all(column in intensity_df for column in INTENSITY_COLUMNS):
+        return pd.DataFrame(columns=["Id", "week", "days"] + INTENSITY_METRICS)
+    rows = pd.DataFrame({"Id": intensity_df["Id"].to_numpy(), "week": _week_starts(intensity_df["date"].to_numpy()).astype("datetime64[us]")})
+    for column in INTENSITY_COLUMNS:
+        rows[column] = intensity_df[column].to_numpy(dtype="float64")
+    weekly = rows.groupby(["Id", "week"], sort=True).agg(days=("Id", "size"), **{column: (column, "sum") for column in INTENSITY_COLUMNS})
+    weekly["moderate_equivalent"] = weekly["FairlyActiveMinutes"] + VIGOROUS_WEIGHT * weekly["VeryActiveMinutes"]
+    return weekly.reset_index()
+
+
+def per_id_rollups(weekly):
+    """Average weekly minutes of each Id, with how many full weeks were logged and how many met the WHO target
+
+    Averages are scaled from minutes per logged day, so partial weeks at
+    either end of the export count for what they cover.
+    """
+    grouped = weekly.groupby("Id")
+    days = grouped["days"].sum()
+    per_id = pd.DataFrame({"days": days})
+    for metric in INTENSITY_METRICS:
+        per_id[metric] = grouped[metric].sum() / days * 7
+    full_weeks = weekly[weekly["days"] == 7]
+    per_id["full_weeks"] = full_weeks.groupby("Id").size().reindex(per_id.index, fill_value=0)
+    per_id["weeks_meeting_who"] = (full_weeks[full_weeks["moderate_equivalent"] >= WHO_WEEKLY_MINUTES]
+                                   .groupby("Id").size().reindex(per_id.index, fill_value=0))
+    per_id["meets_who"] = per_id["moderate_equivalent"] >= WHO_WEEKLY_MINUTES
+    return per_id.reset_index()
+
+
+def compute_intensity_view(intensity_df, version=None):
+    """Weekly and per-Id rollups with sorted per-Id distributions in comparison's index layout"""
+    weekly = weekly_rollups(intensity_df)
+    return _intensity_view(weekly, per_id_rollups(weekly), version)
+
+
+def update_intensity_view(view, intensity_delta, version=None):
+    """Fold newly arrived intensity rows into existing rollups without regrouping the daily rows
+
+    Weekly sums are additive per (Id, week), so only the delta is rolled up
+    before it is added to the saved weekly rows.
+    """
+    delta = weekly_rollups(intensity_delta)
+    if delta.empty:
+        weekly = view["weekly"]
+    elif view["weekly"].empty:
+        weekly = delta
+    else:
+        weekly = pd.concat([view["weekly"], delta], ignore_index=True).groupby(["Id", "week"], sort=True).sum().reset_index()
+    return _intensity_view(weekly, per_id_rollups(weekly), version)
+
+
+def _intensity_view(weekly, per_id, version):
+    return {
+        "version": version,
+        "weekly": weekly,
+        "per_id": per_id,
+        "all": {metric: np.sort(per_id[metric].to_numpy(dtype="float64")) for metric in INTENSITY_METRICS},
+        "cohorts": {},
+    }
+
+
+def meets_who_target(weekly_minutes):
+    """Whether WHO moderate-equivalent minutes per week reach the 150-minute target"""
+    return np.asarray(weekly_minutes) >= WHO_WEEKLY_MINUTES
+
+
+def who_compliance(view):
+    """Share of population Ids averaging at least the WHO weekly target"""
+    per_id = view["per_id"]
+    return float(per_id["meets_who"].mean()) if len(per_id) else float("nan")
+
+
+def intensity_breakdown(view):
+    """Population mean of each intensity's weekly minutes"""
+    return {metric: float(view["per_id"][metric].mean()) if len(view["per_id"]) else float("nan") for metric in INTENSITY_METRICS}
+
+
+def save_intensity_view(view, directory):
+    """Materialize the rollups next to the cached tables of their dataset version"""
+    write_arrow(view["weekly"], os.path.join(directory, "intensity_weekly.arrow"))
+    write_arrow(view["per_id"], os.path.join(directory, "intensity_per_id.arrow"))
+
+
+def read_intensity_view(directory, zero_copy=False):
+    """Read the rollups saved for a dataset version; raises OSError if they are missing"""
+    return _intensity_view(read_arrow(os.path.join(directory, "intensity_weekly.arrow"), zero_copy),
+                           read_arrow(os.path.join(directory, "intensity_per_id.arrow"), zero_copy), os.path.basename(directory))
+
+
+def load_intensity_view(directory, intensity_df, zero_copy=False):
+    """Load the rollups for a dataset version, computing and saving them on first use"""
+    if directory is None:
+        return compute_intensity_view(intensity_df)
+    return load_or_build(
+        directory,
+        lambda: read_intensity_view(directory, zero_copy),
+        lambda: compute_intensity_view(intensity_df, version=os.path.basename(directory)),
+        lambda view: save_intensity_view(view, directory),
+    )
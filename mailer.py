@@ -0,0 +1,167 @@
+import itertools
+import os
+import queue
+import smtplib
+import threading
+import time
+from collections import OrderedDict
+
+# Statuses kept for lookups before the oldest are dropped
+MAX_TRACKED_JOBS = 10000
+
+
+class SMTPTransport:
+    """Sends through an SMTP server, keeping authenticated connections open for reuse"""
+
+    def __init__(self, host, port, username=None, password=None, use_ssl=True, pool_size=2, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _open(self):
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        conn = smtp_class(self.host, self.port, timeout=self.timeout)
+        if self.username and self.password:
+            conn.login(self.username, self.password)
+        return conn
+
+    def _acquire(self):
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                return self._open()
+            # Servers drop idle connections; only reuse ones that still answer
+            try:
+                if conn.noop()[0] == 250:
+                    return conn
+            except OSError:
+                pass
+            self._discard(conn)
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            self._discard(conn)
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    def send(self, from_addr, to_addr, message):
+        conn = self._acquire()
+        try:
+            conn.sendmail(from_addr, [to_addr], message)
+        except Exception:
+            self._discard(conn)
+            raise
+        self._release(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._pool.get_nowait())
+            except queue.Empty:
+                return
+
+
+def transport_from_env():
+    """SMTP transport configured from the environment (Gmail over SSL by default)
+
+    Set WELLNEST_SMTP_HOST/WELLNEST_SMTP_PORT to point at another server, e.g.
+    a local debugging server on localhost:1025; WELLNEST_SMTP_SSL=0 disables
+    implicit TLS and login is skipped when no app password is set.
+    """
+    port = int(os.getenv("WELLNEST_SMTP_PORT", "465"))
+    return SMTPTransport(
+        os.getenv("WELLNEST_SMTP_HOST", "smtp.gmail.com"),
+        port,
+        username=os.getenv("WELLNEST_EMAIL"),
+        password=os.getenv("WELLNEST_APP_PASSWORD"),
+        use_ssl=os.getenv("WELLNEST_SMTP_SSL", "1" if port == 465 else "0") == "1",
+    )
+
+
+class MailQueue:
+    """Delivers queued messages from background worker threads, retrying with backoff"""
+
+    def __init__(self, transport, workers=1, max_attempts=4, backoff_seconds=2.0):
+        self.transport = transport
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self._jobs = queue.Queue()
+        self._statuses = OrderedDict()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._threads = [threading.Thread(target=self._work, name=f"mail-worker-{i}", daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, from_addr, to_addr, message):
+        """Queue a message for delivery and return its job id"""
+        job_id = next(self._ids)
+        self._set_status(job_id, state="queued", attempts=0, error=None)
+        self._jobs.put((job_id, from_addr, to_addr, message, 1))
+        return job_id
+
+    def status(self, job_id):
+        """Current delivery status of a job: queued, sending, retrying, sent or failed"""
+        with self._lock:
+            status = self._statuses.get(job_id)
+            return dict(status) if status else None
+
+    def _set_status(self, job_id, **status):
+        with self._lock:
+            self._statuses[job_id] = status
+            self._statuses.move_to_end(job_id)
+            while len(self._statuses) > MAX_TRACKED_JOBS:
+                self._statuses.popitem(last=False)
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            job_id, from_addr, to_addr, message, attempt = job
+            self._set_status(job_id, state="sending", attempts=attempt, error=None)
+            try:
+                self.transport.send(from_addr, to_addr, message)
+                self._set_status(job_id, state="sent", attempts=attempt, error=None)
+            except Exception as e:
+                if attempt >= self.max_attempts:
+                    self._set_status(job_id, state="failed", attempts=attempt, error=str(e))
+                    continue
+                self._set_status(job_id, state="retrying", attempts=attempt, error=str(e))
+                # Requeue after the delay without holding up the other jobs
+                retry = threading.Timer(self.backoff_seconds * 2 ** (attempt - 1), self._jobs.put,
+                                        args=[(job_id, from_addr, to_addr, message, attempt + 1)])
+                retry.daemon = True
+                retry.start()
+
+    def shutdown(self, wait=True):
+        """Stop the workers once the jobs already queued are sent"""
+        for _ in self._threads:
+            self._jobs.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self.transport.close()
+
+
+def wait_for(mail_queue, job_id, timeout=10.0, interval=0.05):
+    """Block until a job is sent or failed (for scripts and tests); returns its final status"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = mail_queue.status(job_id)
+        if status and status["state"] in ("sent", "failed"):
+            return status
+        time.sleep(interval)
+    return mail_queue.status(job_id)
@@ -1,27 +1,59 @@
+import time
+script_started = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
-import altair as alt
 from datetime import datetime, timedelta
 import os
-import base64
-from PIL import Image, ImageFilter
 import numpy as np
 import hashlib
-import json
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import random
-
-import os
+from startup_profile import PROFILE_STARTUP, StartupProfile
+from activity_frame import ActivityFrame
+from activity_cache import ActivityCache
+from activity_store import ActivityStore
+from assets import prepare_image_asset
+from fitbit_cache import build_fitbit_cache, load_fitbit_version
+from chart_cache import POPULATION_OWNER, ChartSpecCache
+from chart_data import MAX_CHART_POINTS, bin_by_date, downsample_extremes, downsample_line
+from badges import evaluate_history, empty_badge_state, read_badge_state, update_badge_state, write_badge_state
+from comparison import build_comparison_index, ordinal, percentile_rank
+from intensity_stats import WHO_WEEKLY_MINUTES, intensity_breakdown, load_intensity_view, meets_who_target, who_compliance
+from population_index import load_population_index, slice_key, slice_percentile_rank, slice_ranges, slice_summary
+from population_stats import load_population_view, population_mean
+from shared_frames import SharedFrames
+from user_metrics import build_metrics, entry_trend, metric_averages, rolling_summary, update_metrics
+from user_store import open_user_store, migrate_json_users
+from weight_history import WeightLog, load_fitbit_weights, population_weight_view, weekly_rate, weight_trend
+
+# Altair, PIL and the SMTP/email stack are imported by the functions that use them
+startup_profile = StartupProfile(start=script_started)
+startup_profile.mark("imports")
+
+def show_startup_profile(last_phase):
+    """Report this run's phase timings when startup profiling is enabled"""
+    if not PROFILE_STARTUP:
+        return
+    startup_profile.mark(last_phase)
+    with st.sidebar.expander("⏱️ Startup profile"):
+        for line in startup_profile.lines():
+            st.caption(line)
+
+@st.cache_resource
+def get_mail_queue():
+    """Start the shared background queue that delivers outgoing email"""
+    from mailer import MailQueue, transport_from_env
+    return MailQueue(transport_from_env())
 
 def send_verification_email(to_email, code):
+    """Queue a verification email, returning its delivery job id (None if it can't be sent)"""
     from_email = os.getenv("WELLNEST_EMAIL")
     app_password = os.getenv("WELLNEST_APP_PASSWORD")
 
-    if not from_email or not app_password:
+    # A custom server (e.g. a local debugging one) may not need a password
+    if not from_email or not (app_password or os.getenv("WELLNEST_SMTP_HOST")):
         st.error("Email credentials are not set in environment variables.")
-        return False
+        return None
 
     subject = "WellNest Verification Code"
     body = f"""
@@ -35,6 +67,9 @@ def send_verification_email(to_email, code):
     </html>
     """
 
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
     msg = MIMEMultipart("alternative")
     msg["Subject"] = subject
     msg["From"] = from_email
@@ -42,13 +77,27 @@ def send_verification_email(to_email, code):
     msg.attach(MIMEText(body, "html"))
 
     try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(from_email, app_password)
-            server.sendmail(from_email, to_email, msg.as_string())
-        return True
+        job_id = get_mail_queue().submit(from_email, to_email, msg.as_string())
+        st.session_state.verification_email_job = job_id
+        return job_id
     except Exception as e:
-        st.error(f"Failed to send verification email: {e}")
-        return False
+        st.error(f"Failed to queue verification email: {e}")
+        return None
+
+def show_email_delivery_status():
+    """Show how far delivery of the latest verification email has got"""
+    job_id = st.session_state.get("verification_email_job")
+    status = get_mail_queue().status(job_id) if job_id else None
+    if status is None:
+        return
+    if status["state"] == "sent":
+        st.success("📬 Verification email delivered.")
+    elif status["state"] == "failed":
+        st.error(f"We couldn't deliver the verification email ({status['error']}). Please resend the code.")
+    elif status["state"] == "retrying":
+        st.warning("📨 Having trouble reaching the mail server, retrying...")
+    else:
+        st.info("📨 Sending your verification email...")
 
 # Initialize session state
 
@@ -57,11 +106,19 @@ if "user" not in st.session_state:
 if "user_profile" not in st.session_state:
     st.session_state.user_profile = None
 if "activity_log" not in st.session_state:
-    st.session_state.activity_log = []
+    st.session_state.activity_log = ActivityFrame()
 if "awarded_badges" not in st.session_state:
     st.session_state.awarded_badges = set()
+if "badge_state" not in st.session_state:
+    st.session_state.badge_state = None
+if "user_metrics" not in st.session_state:
+    st.session_state.user_metrics = None
+if "user_metrics_version" not in st.session_state:
+    st.session_state.user_metrics_version = None
 if "new_badges_to_show" not in st.session_state:
     st.session_state.new_badges_to_show = []
+if "logged_activity_date" not in st.session_state:
+    st.session_state.logged_activity_date = None
 if "auth_mode" not in st.session_state:
     st.session_state.auth_mode = "login"  # "login" or "register"
 
@@ -246,25 +303,16 @@ def verify_password(password, hashed):
     """Verify password against hash"""
     return hash_password(password) == hashed
 
+@st.cache_resource
+def get_user_store():
+    """Open the shared user store, migrating users.json on first use"""
+    store = open_user_store()
+    migrate_json_users(store, "users.json")
+    return store
+
 def save_user_account(email, password, username, age, height, weight):
     """Save user account information"""
-    users_file = "users.json"
-    
-    # Load existing users
-    users = {}
-    if os.path.exists(users_file):
-        try:
-            with open(users_file, 'r') as f:
-                users = json.load(f)
-        except:
-            users = {}
-    
-    # Check if user already exists
-    if email in users:
-        return False, "User already exists"
-    
-    # Add new user
-    users[email] = {
+    user = {
         "password_hash": hash_password(password),
         "username": username,
         "age": age,
@@ -275,38 +323,35 @@ def save_user_account(email, password, username, age, height, weight):
     }
     
     try:
-        with open(users_file, 'w') as f:
-            json.dump(users, f, indent=2)
+        if not get_user_store().create_user(email, user):
+            return False, "User already exists"
         return True, "Account created successfully"
     except Exception as e:
         return False, f"Error saving account: {str(e)}"
 
 def authenticate_user(email, password):
     """Authenticate user login"""
-    users_file = "users.json"
-    
-    if not os.path.exists(users_file):
-        return False, "No users found"
-    
     try:
-        with open(users_file, 'r') as f:
-            users = json.load(f)
+        user = get_user_store().get_user(email)
         
-        if email not in users:
+        if user is None:
             return False, "User not found"
         
-        if verify_password(password, users[email]["password_hash"]):
-            return True, users[email]
+        if verify_password(password, user["password_hash"]):
+            return True, user
         else:
             return False, "Invalid password"
     except Exception as e:
         return False, f"Error authenticating: {str(e)}"
 
+def user_file_stem(email):
+    """Filesystem-safe stem of the per-user files and directories"""
+    return email.replace('@', '_').replace('.', '_')
+
 def get_user_profile_filename():
     """Generate user-specific profile filename"""
     if st.session_state.user:
-        email = st.session_state.user['email'].replace('@', '_').replace('.', '_')
-        return f"profile_{email}.csv"
+        return f"profile_{user_file_stem(st.session_state.user['email'])}.csv"
     return "user_profile.csv"
 
 def save_user_profile(profile_data):
@@ -350,72 +395,163 @@ def get_bmi_category(bmi):
 def get_user_filename():   
     """Generate user-specific filename"""
     if st.session_state.user:
-        email = st.session_state.user['email'].replace('@', '_').replace('.', '_')
-        return f"user_{email}.csv"
+        return f"user_{user_file_stem(st.session_state.user['email'])}.csv"
     return "user_activity_log.csv"
 
-def save_user_data(df):
-    """Save user data to CSV file"""
+def get_user_activity_store():
+    """Open the user's activity store, importing their old CSV log on first use"""
+    if st.session_state.user:
+        directory = f"activity_{user_file_stem(st.session_state.user['email'])}"
+    else:
+        directory = "activity_log"
+    return ActivityStore(directory, legacy_csv=get_user_filename())
+
+def get_user_weight_log():
+    """Open the user's weight log"""
+    if st.session_state.user:
+        return WeightLog(f"weight_{user_file_stem(st.session_state.user['email'])}.csv")
+    return WeightLog("weight_log.csv")
+
+def log_user_weight(day, weight_kg):
+    """Record a weigh-in; the latest one logged is the profile's current weight"""
+    try:
+        weight_log = get_user_weight_log()
+        weight_log.append(day, weight_kg)
+        # A back-dated weigh-in goes into the history without replacing the current weight
+        latest_day = weight_log.load().index[-1]
+        if pd.Timestamp(day) < latest_day:
+            return True, "Weight logged to your history!"
+        profile = st.session_state.user_profile
+        bmi = calculate_bmi(weight_kg, profile["height_cm"])
+        profile.update({"weight_kg": weight_kg, "bmi": bmi})
+        get_user_store().update_user(st.session_state.user['email'], {"weight_kg": weight_kg, "bmi": bmi})
+        return True, "Weight logged successfully!"
+    except Exception as e:
+        return False, f"Error logging weight: {str(e)}"
+
+@st.cache_resource
+def get_activity_cache():
+    """Process-wide cache of each user's activity history, shared by all their sessions"""
+    return ActivityCache()
+
+def save_user_data(entry):
+    """Append a single activity entry to the user's store and their shared history"""
     try:
-        df.to_csv(get_user_filename(), index=False)
+        store = get_user_activity_store()
+        get_activity_cache().append(store, entry)
+        st.session_state.activity_log = get_activity_cache().get(store)
         return True
     except Exception as e:
         st.error(f"Error saving data: {str(e)}")
         return False
 
-def load_user_data():
-    """Load user data from CSV file"""
-    filename = get_user_filename()
+def load_user_activity():
+    """The user's shared activity history, read from disk only when their store changed"""
     try:
-        if os.path.exists(filename):
-            return pd.read_csv(filename, parse_dates=["date"])
-        return pd.DataFrame()
+        return get_activity_cache().get(get_user_activity_store())
     except Exception as e:
         st.error(f"Error loading user data: {str(e)}")
-        return pd.DataFrame()
+        return ActivityFrame()
+
+def load_user_data():
+    """Load user data as a read-only DataFrame sorted by date"""
+    return load_user_activity().sorted_view()
 
 def reset_user_data():
-    """Reset user data by removing the file"""
-    filename = get_user_filename()
+    """Reset user data by removing the stored activity history; the weight log and profile are kept"""
     try:
-        if os.path.exists(filename):
-            os.remove(filename)
-        st.session_state.activity_log = []
+        store = get_user_activity_store()
+        store.reset()
+        get_activity_cache().invalidate(store.directory)
+        if st.session_state.user:
+            get_chart_cache().invalidate(st.session_state.user['email'])
+        st.session_state.activity_log = ActivityFrame()
+        st.session_state.badge_state = empty_badge_state()
+        st.session_state.awarded_badges = set()
+        st.session_state.user_metrics = None
+        st.session_state.user_metrics_version = None
         return True
     except Exception as e:
         st.error(f"Error resetting data: {str(e)}")
         return False
 
-@st.cache_data
-def load_fitbit_data():
-    """Load Fitbit dataset with error handling"""
-    try:
-        # Try to load actual files first
-        activity_df = pd.read_csv("dailyActivity_merged.csv")
-        intensity_df = pd.read_csv("dailyIntensities_merged.csv")
-        sleep_df = pd.read_excel("sleepDay_merged.xlsx")
-
-        activity_df["ActivityDate"] = pd.to_datetime(activity_df["ActivityDate"])
-        intensity_df["ActivityDay"] = pd.to_datetime(intensity_df["ActivityDay"])
-        sleep_df["SleepDay"] = pd.to_datetime(sleep_df["SleepDay"])
-
-        activity_df = activity_df.rename(columns={"ActivityDate": "date", "TotalSteps": "steps", "Calories": "calories"})
-        intensity_df = intensity_df.rename(columns={"ActivityDay": "date"})
-        sleep_df = sleep_df.rename(columns={"SleepDay": "date"})
-        sleep_df["sleep_hours"] = sleep_df["TotalMinutesAsleep"] / 60
-
-        merged_df = pd.merge(activity_df, sleep_df[["Id", "date", "sleep_hours"]], on=["Id", "date"], how="left")
-        merged_df = merged_df[merged_df["sleep_hours"].notna() & (merged_df["sleep_hours"] > 0)]
-
-        return merged_df, intensity_df, sleep_df
+# Replicas pointed at one WELLNEST_CACHE_DIR also map the population views read-only instead of loading a copy
+SHARED_CACHE = os.getenv("WELLNEST_SHARED_CACHE") == "1"
 
+def get_fitbit_version():
+    """Current Fitbit dataset version, rebuilt or refreshed when the source files change"""
+    try:
+        # Cheap when nothing changed: sources are only re-hashed after their size or mtime moves
+        return build_fitbit_cache()
     except FileNotFoundError:
+        return None
+    except Exception as e:
+        st.error(f"Error loading Fitbit data: {str(e)}")
+        return None
+
+# Two entries so sessions still on the previous version keep theirs while the new one loads
+@st.cache_resource(max_entries=2)
+def load_fitbit_data(version_dir):
+    """Load a Fitbit dataset version once, as read-only frames that every session shares"""
+    if version_dir is None:
         # Generate sample data if files don't exist
         st.warning("⚠️ Fitbit data files not found. Using sample data for demonstration.")
-        return generate_sample_data()
+        return SharedFrames(generate_sample_data())
+    try:
+        # Columns map straight into the on-disk Arrow cache of this dataset version
+        return SharedFrames(load_fitbit_version(version_dir, zero_copy=True))
     except Exception as e:
         st.error(f"Error loading Fitbit data: {str(e)}")
-        return generate_sample_data()
+        return SharedFrames(generate_sample_data())
+
+def get_fitbit_data(version_dir):
+    """Shared (merged_df, intensity_df, sleep_df) for this run; copy a frame before changing it"""
+    return load_fitbit_data(version_dir).check()
+
+@st.cache_resource(max_entries=2)
+def load_population_stats(version_dir, _merged_df, _intensity_df, _sleep_df):
+    """Load the population aggregates for a Fitbit dataset version"""
+    # Sample data has no on-disk version (None), so its aggregates are kept in memory only
+    return load_population_view(version_dir, _merged_df, _intensity_df, _sleep_df, zero_copy=SHARED_CACHE)
+
+@st.cache_resource(max_entries=2)
+def load_population_weight_view(path, mtime_ns):
+    """Latest weight and BMI per population Id; mtime_ns reloads it when the file changes"""
+    return population_weight_view(load_fitbit_weights(path))
+
+def get_population_weights():
+    """Population weight view from the Fitbit weight log, or None without one"""
+    path = "weightLogInfo_merged.csv"
+    try:
+        return load_population_weight_view(path, os.stat(path).st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+@st.cache_resource(max_entries=2)
+def load_intensity_stats(version_dir, _intensity_df):
+    """Load the weekly intensity rollups for a Fitbit dataset version"""
+    return load_intensity_view(version_dir, _intensity_df, zero_copy=SHARED_CACHE)
+
+@st.cache_resource(max_entries=2)
+def load_population_slices(version_dir, _merged_df):
+    """Load the (Id, date) index used to slice the population by date, day type and cohort"""
+    return load_population_index(version_dir, _merged_df, zero_copy=SHARED_CACHE)
+
+def load_population_cohorts():
+    """Bucket population Ids by BMI category using their latest Fitbit weight log entry"""
+    population_weights = get_population_weights()
+    if population_weights is None:
+        return None
+    latest_bmi = population_weights["latest"]["bmi"].dropna()
+    return pd.DataFrame({
+        "Id": latest_bmi.index,
+        "bmi_category": [get_bmi_category(bmi)[0] for bmi in latest_bmi]
+    })
+
+@st.cache_resource(max_entries=2)
+def load_comparison_index(version, _merged_df, _intensity_df):
+    """Pre-sort the population distributions used for percentile comparisons"""
+    return build_comparison_index(_merged_df, _intensity_df, cohorts=load_population_cohorts())
 
 def generate_sample_data():
     """Generate sample data for demonstration"""
@@ -466,36 +602,34 @@ def generate_sample_data():
     
     return activity_df, intensity_df, sleep_df
 
-def check_new_badges(df):
+def get_badge_state_path():
+    """Generate user-specific badge state path"""
+    return os.path.join(get_user_activity_store().directory, "badges.json")
+
+def load_badge_state(activity_df):
+    """Load the user's badge state, re-evaluating their history if none is stored or it does not cover every entry"""
+    state = read_badge_state(get_badge_state_path())
+    if state is None or state.get("entries") != len(activity_df):
+        state, _ = evaluate_history(activity_df, awarded=state["awarded"] if state else ())
+    return state
+
+def check_new_badges(entry):
     """Check for new badge achievements"""
-    new_badges = []
-
-    if any(df["steps"] >= 10000) and "🥈 Step Champ" not in st.session_state.awarded_badges:
-        new_badges.append("🥈 Step Champ")
-
-    if any(df["sleep_hours"] >= 8) and "🥇 Sleeper Pro" not in st.session_state.awarded_badges:
-        new_badges.append("🥇 Sleeper Pro")
-
-    if df.shape[0] > 0 and "🥉 First Step" not in st.session_state.awarded_badges:
-        new_badges.append("🥉 First Step")
-
-    # Check for consistency streak
-    if len(df) >= 7:
-        dates = sorted(df["date"].dt.date.unique())
-        streak_count = 1
-        for i in range(1, len(dates)):
-            if (dates[i] - dates[i - 1]).days == 1:
-                streak_count += 1
-                if streak_count >= 7 and "🔥 Consistency" not in st.session_state.awarded_badges:
-                    new_badges.append("🔥 Consistency")
-                    break
-            else:
-                streak_count = 1
+    history = load_user_data()
+    # Start from the stored state: another session of this user may have logged since this one loaded it
+    state = read_badge_state(get_badge_state_path()) or st.session_state.badge_state
+    if state is not None and state.get("entries") == len(history) - 1:
+        state, new_badges = update_badge_state(state, entry, history_loader=load_user_data)
+    else:
+        state, new_badges = evaluate_history(history, awarded=state["awarded"] if state else ())
+    st.session_state.badge_state = state
+    st.session_state.awarded_badges = set(state["awarded"])
+    try:
+        write_badge_state(get_badge_state_path(), state)
+    except Exception as e:
+        st.error(f"Error saving badges: {str(e)}")
 
-    # Update session state
     if new_badges:
-        for badge in new_badges:
-            st.session_state.awarded_badges.add(badge)
         st.session_state.new_badges_to_show = new_badges.copy()
 
 def validate_inputs(steps, calories, sleep_hours):
@@ -529,8 +663,7 @@ def log_activity_and_check_badges(activity_date, steps, calories, sleep_hours):
         return False
     
     # Check for duplicate entries
-    existing_dates = [entry['date'] for entry in st.session_state.activity_log]
-    if activity_date in existing_dates:
+    if st.session_state.activity_log.has_date(activity_date):
         st.warning("An entry for this date already exists. Please delete it first or choose a different date.")
         return False
     
@@ -540,26 +673,139 @@ def log_activity_and_check_badges(activity_date, steps, calories, sleep_hours):
         "calories": int(calories),
         "sleep_hours": float(sleep_hours)
     }
-    st.session_state.activity_log.append(new_log)
 
-    df = pd.DataFrame(st.session_state.activity_log)
-    df["date"] = pd.to_datetime(df["date"])
+    store_version = get_user_activity_store().version()
+    if save_user_data(new_log):
+        check_new_badges(new_log)
+        get_chart_cache().invalidate(st.session_state.user['email'])
+        # Metrics built before another session's logs are rebuilt rather than updated
+        if st.session_state.user_metrics is not None and st.session_state.user_metrics_version == store_version:
+            st.session_state.user_metrics = update_metrics(st.session_state.user_metrics, new_log, history_loader=load_user_data)
+        else:
+            st.session_state.user_metrics = build_metrics(load_user_data())
+        st.session_state.user_metrics_version = get_user_activity_store().version()
 
-    if save_user_data(df):
-        check_new_badges(df)
-        
-        # Show achievement toasts
-        if st.session_state.get("new_badges_to_show"):
-            for badge in st.session_state.new_badges_to_show:
-                st.toast(f"🎉 Achievement Unlocked: {badge}")
-            st.session_state.new_badges_to_show.clear()
-        
-        st.success("Activity logged successfully!")
+        # Shown by show_logged_activity_notices after the rerun that refreshes the history
+        st.session_state.logged_activity_date = activity_date
         return True
     return False
 
+def show_logged_activity_notices():
+    """Confirm the last logged activity and toast the badges it unlocked, once"""
+    if st.session_state.logged_activity_date is None:
+        return
+    st.success(f"Activity for {st.session_state.logged_activity_date.strftime('%B %d, %Y')} logged successfully!")
+    for badge in st.session_state.new_badges_to_show:
+        st.toast(f"🎉 Achievement Unlocked: {badge}")
+    st.session_state.new_badges_to_show.clear()
+    st.session_state.logged_activity_date = None
+
+@st.cache_resource
+def get_chart_cache():
+    """Process-wide cache of serialized chart specs"""
+    return ChartSpecCache()
+
+def show_cached_chart(owner, version, kind, build, **viewport):
+    """Render a chart from the spec cache, building it only on a miss"""
+    spec = get_chart_cache().get_or_build(owner, version, kind, build, **viewport)
+    st.vega_lite_chart(spec, use_container_width=True)
+
+def build_steps_chart(user_df):
+    """User steps line chart"""
+    import altair as alt
+    return alt.Chart(downsample_line(user_df[["date", "steps"]], "date", "steps")).mark_line(color="green", strokeWidth=3).encode(
+        x=alt.X("date:T", title="Date"),
+        y=alt.Y("steps:Q", title="Steps"),
+        tooltip=["date", "steps"]
+    ).properties(title="Steps Over Time", width=200, height=200)
+
+def build_calories_chart(user_df):
+    """User calories area chart"""
+    import altair as alt
+    return alt.Chart(downsample_extremes(user_df[["date", "calories"]], "date", "calories")).mark_area(color="orange", opacity=0.7).encode(
+        x=alt.X("date:T", title="Date"), 
+        y=alt.Y("calories:Q", title="Calories"),
+        tooltip=["date", "calories"]
+    ).properties(title="Calories Burned", width=200, height=200)
+
+def build_sleep_chart(user_df):
+    """User sleep bar chart"""
+    import altair as alt
+    return alt.Chart(bin_by_date(user_df, "date", "sleep_hours")).mark_bar(color="blue").encode(
+        x=alt.X("date:T", title="Date"),
+        y=alt.Y("sleep_hours:Q", title="Sleep Hours"),
+        tooltip=["date", "sleep_hours"]
+    ).properties(title="Sleep Hours", width=200, height=200)
+
+def build_weight_chart(trend):
+    """User BMI per weigh-in with its smoothed trend line"""
+    import altair as alt
+    base = alt.Chart(downsample_line(trend[["date", "bmi", "trend_bmi"]], "date", "trend_bmi")).encode(x=alt.X("date:T", title="Date"))
+    points = base.mark_circle(color="#764ba2", opacity=0.5).encode(y=alt.Y("bmi:Q", title="BMI", scale=alt.Scale(zero=False)),
+                                                                  tooltip=["date", alt.Tooltip("bmi:Q", format=".1f")])
+    line = base.mark_line(color="#6b46c1", strokeWidth=3).encode(y="trend_bmi:Q", tooltip=["date", alt.Tooltip("trend_bmi:Q", format=".1f")])
+    return (points + line).properties(title="BMI Trajectory", height=250)
+
+def build_population_steps_chart(fitbit_df):
+    """Population steps line chart"""
+    import altair as alt
+    return alt.Chart(downsample_line(fitbit_df[["date", "steps"]], "date", "steps")).mark_line(strokeWidth=2).encode(
+        x=alt.X('date:T', title="Date"), 
+        y=alt.Y('steps:Q', title="Steps"),
+        tooltip=["date", "steps"]
+    ).properties(title="Steps Trend Over Time")
+
+def build_population_sleep_chart(sleep_df):
+    """Population sleep scatter chart"""
+    import altair as alt
+    return alt.Chart(downsample_extremes(sleep_df[["date", "sleep_hours"]], "date", "sleep_hours")).mark_circle(size=60, color='skyblue').encode(
+        x=alt.X('date:T', title="Date"),
+        y=alt.Y('sleep_hours:Q', title="Sleep Hours"),
+        tooltip=["date", "sleep_hours"]
+    ).properties(title="Sleep Patterns")
+
+def build_intensity_chart(breakdown):
+    """Population weekly minutes at each activity intensity"""
+    import altair as alt
+    chart_data = pd.DataFrame({
+        "Intensity": ["Lightly Active", "Fairly Active", "Very Active"],
+        "Minutes": [breakdown["LightlyActiveMinutes"], breakdown["FairlyActiveMinutes"], breakdown["VeryActiveMinutes"]]
+    })
+    return alt.Chart(chart_data).mark_bar(color="#764ba2").encode(
+        x=alt.X("Intensity:N", title=None, sort=None),
+        y=alt.Y("Minutes:Q", title="Minutes per Week"),
+        tooltip=["Intensity", alt.Tooltip("Minutes:Q", format=".0f")]
+    ).properties(title="Average Weekly Active Minutes", height=250)
+
+def build_averages_chart(averages, title, color, stroke):
+    """Bar chart of average steps, calories and sleep"""
+    import altair as alt
+    chart_data = pd.DataFrame({
+        "Metric": ["Steps", "Calories", "Sleep Hours"],
+        "Value": [averages["steps"], averages["calories"], averages["sleep_hours"]],
+        "Color": [color, color, color]
+    })
+    return alt.Chart(chart_data).mark_bar(
+        color=color,
+        strokeWidth=2,
+        stroke=stroke
+    ).encode(
+        x=alt.X("Metric:N", title="Metrics", axis=alt.Axis(labelAngle=0)),
+        y=alt.Y("Value:Q", title="Average Value"),
+        tooltip=["Metric:N", alt.Tooltip("Value:Q", format=".1f")]
+    ).properties(
+        width=300,
+        height=400,
+        title=alt.TitleParams(
+            text=title,
+            fontSize=16,
+            fontWeight="bold"
+        )
+    )
+
 # Create header banner
 create_header_banner()
+startup_profile.mark("session state and styles")
 
 # LOGIN/REGISTER SYSTEM
 if not st.session_state.user:    
@@ -601,6 +847,7 @@ if not st.session_state.user:
     elif st.session_state.auth_mode == "verify":
         st.markdown("### Email Verification")
         st.markdown("Please check your email for the 6-digit code we sent.")
+        show_email_delivery_status()
     
         # Check if code has expired
         if st.session_state.code_expires_at and datetime.now() > st.session_state.code_expires_at:
@@ -660,7 +907,7 @@ if not st.session_state.user:
             st.session_state.code_expires_at = datetime.now() + timedelta(minutes=10)
             st.session_state.last_code_sent_at = datetime.now()
             if send_verification_email(st.session_state.verification_target, new_code):
-                st.success("New code sent. Check your inbox.")
+                st.success("New code queued for delivery. Check your inbox shortly.")
                 st.rerun()
 
     
@@ -704,6 +951,8 @@ if not st.session_state.user:
                 verification_code = str(random.randint(100000, 999999))
                 st.session_state.verification_code = verification_code
                 st.session_state.verification_target = email
+                st.session_state.code_expires_at = datetime.now() + timedelta(minutes=10)
+                st.session_state.last_code_sent_at = datetime.now()
                 st.session_state.pending_registration = {
                     "email": email,
                     "username": username,
@@ -714,7 +963,7 @@ if not st.session_state.user:
                 }
 
                 if send_verification_email(email, verification_code):
-                    st.success("Verification code sent to your email!")
+                    st.success("Verification code queued for delivery!")
                     st.session_state.auth_mode = "verify"
                     st.rerun()
                 else:
@@ -752,44 +1001,73 @@ if not st.session_state.user:
         </div>
         """, unsafe_allow_html=True)
     
+    show_startup_profile("auth screen")
     st.stop()
 
 # MAIN APPLICATION
-# Load Fitbit data
-fitbit_df, intensity_df, sleep_df = load_fitbit_data()
+# Each page declares the data it needs, which is loaded only when that page is shown
+def load_activity_page_data():
+    """Load the signed-in user's activity history, badges and metrics into the session"""
+    # Shared with the user's other sessions; only re-read when the store's files changed
+    store_version = get_user_activity_store().version()
+    st.session_state.activity_log = load_user_activity()
+    activity_data = st.session_state.activity_log.sorted_view()
+    # Reloaded when the history gained or lost entries since the badges were loaded, e.g. from another session
+    if st.session_state.badge_state is None or st.session_state.badge_state.get("entries") != len(activity_data):
+        st.session_state.badge_state = load_badge_state(activity_data)
+        st.session_state.awarded_badges = set(st.session_state.badge_state["awarded"])
+    # Rebuilt whenever the history changed since they were built, e.g. from another session
+    if st.session_state.user_metrics is None or st.session_state.user_metrics_version != store_version:
+        st.session_state.user_metrics = build_metrics(activity_data)
+        st.session_state.user_metrics_version = store_version
+    return {}
+
+@st.cache_data(max_entries=64)
+def load_weight_trend(path, version, height_cm):
+    """BMI trajectory of a weight log; version changes whenever the log does"""
+    return weight_trend(WeightLog(path).load(), height_cm)
+
+def load_weight_page_data():
+    """Load the signed-in user's weight trend and the population weight distributions"""
+    profile = st.session_state.user_profile
+    if not profile:
+        return {"weight_trend": None, "population_weights": None}
+    weight_log = get_user_weight_log()
+    return {
+        "weight_trend": load_weight_trend(weight_log.path, weight_log.version(), profile["height_cm"]),
+        "population_weights": get_population_weights()
+    }
 
-# Load user activity data
-activity_data = load_user_data()
-if not activity_data.empty:
-    st.session_state.activity_log = activity_data.to_dict("records")
+def load_population_page_data():
+    """Load the Fitbit frames and their population aggregates"""
+    # Checked on every run, so a refreshed dataset reaches running sessions on their next interaction
+    version_dir = get_fitbit_version()
+    fitbit_df, intensity_df, sleep_df = get_fitbit_data(version_dir)
+    return {
+        "fitbit_df": fitbit_df,
+        "intensity_df": intensity_df,
+        "sleep_df": sleep_df,
+        "population_stats": load_population_stats(version_dir, fitbit_df, intensity_df, sleep_df),
+        "intensity_stats": load_intensity_stats(version_dir, intensity_df),
+        "population_index": load_population_slices(version_dir, fitbit_df)
+    }
 
-# Sidebar
-logo_path =  "logo.jpg"
-with st.sidebar:
-    if os.path.exists(logo_path):
-        try:
-            logo = Image.open(logo_path)
-            st.image(logo, use_container_width=True)
-        except Exception as e:
-            st.write("WELLNEST")
-    else:
-        st.markdown("## WellNest")
+# Sidebar logo width in pixels (twice the sidebar's width for sharp rendering on HiDPI screens)
+LOGO_WIDTH = 600
 
-    st.markdown(f"### Welcome, {st.session_state.user_profile['username'] if st.session_state.user_profile else 'User'}! 👋")
-    
-    page = st.radio("Navigate", ["User Profile", "Activity Logger", "Health Insights", "Compare with Fitbit"])
-    st.sidebar.markdown("---")
-
-    if st.sidebar.button("Log out"):
-        st.session_state.user = None
-        st.session_state.user_profile = None
-        st.session_state.activity_log = []
-        st.session_state.awarded_badges = set()
-        st.session_state.new_badges_to_show = []
-        st.rerun()
+@st.cache_resource
+def load_logo_asset(path, mtime_ns):
+    """Sidebar logo resized once to its display width; mtime_ns reloads it when the file changes"""
+    return prepare_image_asset(path, LOGO_WIDTH)
 
+PAGE_DATA_LOADERS = {
+    "activity": load_activity_page_data,
+    "population": load_population_page_data,
+    "weight": load_weight_page_data
+}
 
-if page == "User Profile":
+def show_profile_page(data):
+    """User profile, achievements and personal insights"""
     st.title("USER PROFILE")
 
     if st.session_state.user and st.session_state.user_profile:
@@ -862,23 +1140,17 @@ if page == "User Profile":
                         st.session_state.user_profile = updated_profile
                         st.session_state.user["username"] = new_username
                         
-                        # Update in users.json as well
-                        users_file = "users.json"
-                        if os.path.exists(users_file):
-                            try:
-                                with open(users_file, 'r') as f:
-                                    users = json.load(f)
-                                users[st.session_state.user['email']].update({
-                                    "username": new_username,
-                                    "age": new_age,
-                                    "height_cm": new_height,
-                                    "weight_kg": new_weight,
-                                    "bmi": calculate_bmi(new_weight, new_height)
-                                })
-                                with open(users_file, 'w') as f:
-                                    json.dump(users, f, indent=2)
-                            except:
-                                pass
+                        # Update in the user store as well
+                        try:
+                            get_user_store().update_user(st.session_state.user['email'], {
+                                "username": new_username,
+                                "age": new_age,
+                                "height_cm": new_height,
+                                "weight_kg": new_weight,
+                                "bmi": calculate_bmi(new_weight, new_height)
+                            })
+                        except Exception as e:
+                            st.error(f"Error updating account: {str(e)}")
                         
                         st.success("Profile updated successfully! 🎉")
                         st.session_state.show_edit_profile = False
@@ -888,28 +1160,67 @@ if page == "User Profile":
                     if st.form_submit_button("❌ Cancel"):
                         st.session_state.show_edit_profile = False
                         st.rerun()
-        
+
+        # Weight history
+        st.markdown("---")
+        st.markdown("### ⚖️ Weight & BMI History")
+
+        weight_col1, weight_col2 = st.columns([1, 2])
+        with weight_col1:
+            with st.form("log_weight_form"):
+                weigh_in_date = st.date_input("Date", value=datetime.today().date(), max_value=datetime.today().date())
+                weigh_in_kg = st.number_input("Weight (kg)", min_value=20.0, max_value=300.0, value=float(profile['weight_kg']),
+                                              step=0.1, key="log_weight_kg")
+                if st.form_submit_button("Log Weight", type="primary"):
+                    success, message = log_user_weight(weigh_in_date, weigh_in_kg)
+                    if success:
+                        st.success(message)
+                        st.rerun()
+                    else:
+                        st.error(message)
+
+        with weight_col2:
+            trend = data["weight_trend"]
+            if trend is not None and not trend.empty:
+                latest = trend.iloc[-1]
+                rate = weekly_rate(trend)
+                population_weights = data["population_weights"]
+
+                metric_col1, metric_col2, metric_col3 = st.columns(3)
+                with metric_col1:
+                    st.metric("Latest BMI", f"{latest['bmi']:.1f}", f"{latest['bmi'] - trend['bmi'].iloc[0]:+.1f} since first log",
+                              delta_color="inverse")
+                with metric_col2:
+                    st.metric("Weekly Change", f"{rate:+.2f} kg" if rate is not None else "-")
+                with metric_col3:
+                    rank = percentile_rank(population_weights, "bmi", latest['bmi']) if population_weights else float("nan")
+                    st.metric("Fitbit BMI Percentile", ordinal(round(rank)) if not np.isnan(rank) else "-")
+
+                show_cached_chart(st.session_state.user['email'], (get_user_weight_log().version(), profile['height_cm']), "bmi_trajectory",
+                                  lambda: build_weight_chart(trend), max_points=MAX_CHART_POINTS)
+            else:
+                st.info("Log your weight to start tracking your BMI over time.")
+
         # Health Insights based on profile
         st.markdown("---")
         st.markdown("### Personalized Health Insights")
         
         if st.session_state.activity_log:
-            df = pd.DataFrame(st.session_state.activity_log)
-            df["date"] = pd.to_datetime(df["date"])
-            df = df.sort_values("date")
+            metrics = st.session_state.user_metrics
+            averages = metric_averages(metrics)
 
             # Health metrics based on profile
             col1, col2, col3, col4 = st.columns(4)
             with col1:
-                st.metric("Total Entries", len(df))
+                st.metric("Total Entries", metrics["count"])
             with col2:
-                avg_steps = df['steps'].mean()
+                avg_steps = averages['steps']
                 st.metric("Avg Steps", f"{int(avg_steps):,}")
             with col3:
-                avg_calories = df['calories'].mean()
+                avg_calories = averages['calories']
                 st.metric("Avg Calories", f"{int(avg_calories)}")
             with col4:
-                avg_sleep = df['sleep_hours'].mean()
+                avg_sleep = averages['sleep_hours']
                 st.metric("Avg Sleep", f"{avg_sleep:.1f}h")
 
             # Personalized recommendations based on age and BMI
@@ -944,9 +1255,9 @@ if page == "User Profile":
 
             # Trends section (existing code)
             st.markdown("### Trend Analysis")
-            if len(df) >= 6:
-                recent = df.iloc[-3:].mean(numeric_only=True)
-                previous = df.iloc[-6:-3].mean(numeric_only=True)
+            trend = entry_trend(metrics)
+            if trend is not None:
+                recent, previous = trend
 
                 trend_col1, trend_col2, trend_col3 = st.columns(3)
                 
@@ -963,15 +1274,23 @@ if page == "User Profile":
                     st.metric("Sleep Trend", f"{recent['sleep_hours']:.1f}h", f"{sleep_change:+.1f}h")
             else:
                 st.info("Log more activities to see trend analysis (minimum 6 entries needed)")
+
+            st.markdown("#### Rolling Averages")
+            st.dataframe(
+                rolling_summary(metrics).style.format({"Steps": "{:,.0f}", "Calories": "{:,.0f}", "Sleep (h)": "{:.1f}"}, na_rep="-"),
+                hide_index=True, use_container_width=True
+            )
         else:
             st.info("Start logging your daily activities to see personalized insights!")
     
     else:
         st.error("Profile data not found. Please log out and create your account again.")
 
-elif page == "Activity Logger":
-    st.title("ACTIVITY LOGGER")
-    
+# Editing an input only reruns this fragment; a logged entry reruns the page so the history and charts pick it up
+@st.fragment
+def show_activity_form():
+    """Date picker, activity inputs and the log/reset buttons"""
+    show_logged_activity_notices()
     col1, col2 = st.columns([1, 1])
     
     with col1:
@@ -1017,7 +1336,8 @@ elif page == "Activity Logger":
         
         with btn_col1:
             if st.button("Log Activity", type="primary", use_container_width=True):
-                log_activity_and_check_badges(activity_date, steps, calories, sleep_hours)
+                if log_activity_and_check_badges(activity_date, steps, calories, sleep_hours):
+                    st.rerun()
 
         with btn_col2:
             if st.button("Reset All Data", use_container_width=True):
@@ -1025,104 +1345,151 @@ elif page == "Activity Logger":
                     st.success("All data has been reset!")
                     st.rerun()
 
-    # Display logged activities
-    if st.session_state.activity_log:
-        user_df = pd.DataFrame(st.session_state.activity_log)
-        user_df["date"] = pd.to_datetime(user_df["date"])
-        user_df = user_df.sort_values("date", ascending=False)
+@st.fragment
+def show_activity_history():
+    """The user's logged activities, newest first"""
+    st.markdown("---")
+    st.subheader("Your Activity History")
+    st.dataframe(st.session_state.activity_log.sorted_view(ascending=False), use_container_width=True)
+
+@st.fragment
+def show_activity_charts():
+    """Steps, calories and sleep charts of the user's history"""
+    user_df = st.session_state.activity_log.sorted_view(ascending=False)
+    # Charts (long histories are downsampled to at most MAX_CHART_POINTS per chart)
+    st.markdown("### Your Progress Charts")
+    chart_col1, chart_col2, chart_col3 = st.columns(3)
+    
+    chart_owner = st.session_state.user['email']
+    data_version = get_user_activity_store().version()
+    with chart_col1:
+        show_cached_chart(chart_owner, data_version, "steps_over_time", lambda: build_steps_chart(user_df), max_points=MAX_CHART_POINTS)
 
-        st.markdown("---")
-        st.subheader("Your Activity History")
-        
-        # Display data
-        st.dataframe(user_df, use_container_width=True)
+    with chart_col2:
+        show_cached_chart(chart_owner, data_version, "calories_burned", lambda: build_calories_chart(user_df), max_points=MAX_CHART_POINTS)
 
-        # Charts
-        st.markdown("### Your Progress Charts")
-        chart_col1, chart_col2, chart_col3 = st.columns(3)
-        
-        with chart_col1:
-            st.altair_chart(
-                alt.Chart(user_df).mark_line(color="green", strokeWidth=3).encode(
-                    x=alt.X("date:T", title="Date"),
-                    y=alt.Y("steps:Q", title="Steps"),
-                    tooltip=["date", "steps"]
-                ).properties(title="Steps Over Time", width=200, height=200),
-                use_container_width=True
-            )
+    with chart_col3:
+        show_cached_chart(chart_owner, data_version, "sleep_hours", lambda: build_sleep_chart(user_df), max_points=MAX_CHART_POINTS)
 
-        with chart_col2:
-            st.altair_chart(
-                alt.Chart(user_df).mark_area(color="orange", opacity=0.7).encode(
-                    x=alt.X("date:T", title="Date"), 
-                    y=alt.Y("calories:Q", title="Calories"),
-                    tooltip=["date", "calories"]
-                ).properties(title="Calories Burned", width=200, height=200),
-                use_container_width=True
-            )
+def show_activity_logger_page(data):
+    """Log daily activities and chart the user's history"""
+    st.title("ACTIVITY LOGGER")
+    show_activity_form()
+    if st.session_state.activity_log:
+        show_activity_history()
+        show_activity_charts()
 
-        with chart_col3:
-            st.altair_chart(
-                alt.Chart(user_df).mark_bar(color="blue").encode(
-                    x=alt.X("date:T", title="Date"),
-                    y=alt.Y("sleep_hours:Q", title="Sleep Hours"),
-                    tooltip=["date", "sleep_hours"]
-                ).properties(title="Sleep Hours", width=200, height=200),
-                use_container_width=True
-            )
+def show_population_filter(index, key):
+    """Date window, day type and cohort controls; returns the slice's row ranges and a description, or None when unfiltered"""
+    if index["first_day"] is None:
+        return None
+    first_day, last_day = index["first_day"].item(), index["last_day"].item()
+    with st.expander("🔎 Filter the population"):
+        window = st.date_input("Dates", value=(first_day, last_day), min_value=first_day, max_value=last_day, key=f"{key}_dates")
+        days = st.radio("Days", ["all", "weekdays", "weekends"], format_func=str.capitalize, horizontal=True, key=f"{key}_days")
+        cohorts = load_population_cohorts()
+        bmi_groups = [] if cohorts is None else sorted(cohorts["bmi_category"].unique())
+        cohort = st.selectbox("Participants", ["All participants"] + bmi_groups + ["Selected Ids"], key=f"{key}_cohort")
+        ids = None
+        if cohort == "Selected Ids":
+            ids = st.multiselect("Ids", index["ids"].tolist(), key=f"{key}_ids")
+        elif cohort != "All participants":
+            ids = cohorts.loc[cohorts["bmi_category"] == cohort, "Id"].to_numpy()
+
+    # A date range is picked in two clicks; until the second one only its start is set
+    start, end = (window[0], window[-1]) if len(window) else (first_day, last_day)
+    if (start, end) == (first_day, last_day) and days == "all" and ids is None:
+        return None
+    description = [f"{start:%b %d, %Y} – {end:%b %d, %Y}"]
+    if days != "all":
+        description.append(days)
+    if ids is not None:
+        description.append(cohort.lower() if cohort != "Selected Ids" else f"{len(ids)} selected Ids")
+    return slice_ranges(index, np.datetime64(start), np.datetime64(end), days, ids), ", ".join(description)
+
+def show_health_insights_page(data):
+    """Population statistics from the Fitbit dataset"""
+    fitbit_df, sleep_df, population_stats = data["fitbit_df"], data["sleep_df"], data["population_stats"]
 
-elif page == "Health Insights":
     st.title("HEALTH INSIGHTS")
     st.markdown("*Based on fitness tracker data analysis*")
 
     # Summary statistics
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Average Steps", f"{int(fitbit_df['steps'].mean()):,}")
+        st.metric("Average Steps", f"{int(population_mean(population_stats, 'steps')):,}")
     with col2:
-        st.metric("Average Calories", f"{int(fitbit_df['calories'].mean())}")
+        st.metric("Average Calories", f"{int(population_mean(population_stats, 'calories'))}")
     with col3:
-        st.metric("Average Sleep", f"{sleep_df['sleep_hours'].mean():.1f} hrs")
+        st.metric("Average Sleep", f"{population_mean(population_stats, 'logged_sleep_hours'):.1f} hrs")
 
     # Charts
     st.markdown("### Population Trends")
     
     row1_col1, row1_col2 = st.columns(2)
+    # Population charts are the same for everyone, so they are built once per dataset version
     with row1_col1:
-        st.altair_chart(
-            alt.Chart(fitbit_df.sample(min(100, len(fitbit_df)))).mark_line(strokeWidth=2).encode(
-                x=alt.X('date:T', title="Date"), 
-                y=alt.Y('steps:Q', title="Steps"),
-                tooltip=["date", "steps"]
-            ).properties(title="Steps Trend Over Time"),
-            use_container_width=True
-        )
+        show_cached_chart(POPULATION_OWNER, population_stats["version"], "steps_trend",
+                          lambda: build_population_steps_chart(fitbit_df), max_points=MAX_CHART_POINTS)
 
     with row1_col2:
-        st.altair_chart(
-            alt.Chart(sleep_df.sample(min(100, len(sleep_df)))).mark_circle(size=60, color='skyblue').encode(
-                x=alt.X('date:T', title="Date"),
-                y=alt.Y('sleep_hours:Q', title="Sleep Hours"),
-                tooltip=["date", "sleep_hours"]
-            ).properties(title="Sleep Patterns"),
-            use_container_width=True
-        )
+        show_cached_chart(POPULATION_OWNER, population_stats["version"], "sleep_patterns",
+                          lambda: build_population_sleep_chart(sleep_df), max_points=MAX_CHART_POINTS)
+
+    # Slices are binary-search lookups on the (Id, date) index, so filtering stays interactive
+    st.markdown("### Population Slices")
+    population_filter = show_population_filter(data["population_index"], "insights_filter")
+    if population_filter is None:
+        st.caption("Filter by dates, weekdays or weekends, or a group of participants to see how their averages differ.")
+        return
+    ranges, description = population_filter
+    summary = slice_summary(data["population_index"], ranges)
+    if summary["days"] == 0:
+        st.info(f"No population data for {description}.")
+        return
+    st.caption(f"{summary['days']:,} days from {summary['ids']} participants ({description})")
+    slice_col1, slice_col2, slice_col3 = st.columns(3)
+    for slice_col, metric, label in zip((slice_col1, slice_col2, slice_col3), ["steps", "calories", "sleep_hours"], ["Steps", "Calories", "Sleep"]):
+        with slice_col:
+            value, population_value = summary[metric], population_mean(population_stats, metric)
+            if np.isnan(value):
+                st.metric(f"Slice {label}", "N/A")
+            elif metric == "sleep_hours":
+                st.metric(f"Slice {label}", f"{value:.1f} hrs", f"{value - population_value:+.1f} hrs vs all")
+            else:
+                st.metric(f"Slice {label}", f"{int(value):,}", f"{value - population_value:+,.0f} vs all")
+
+def show_compare_page(data):
+    """Compare the user's averages with the Fitbit population"""
+    fitbit_df, intensity_df, population_stats = data["fitbit_df"], data["intensity_df"], data["population_stats"]
 
-elif page == "Compare with Fitbit":
     st.title("🔍 COMPARE WITH POPULATION DATA")
     
     if not st.session_state.activity_log:
         st.info("Log some activities first to enable comparison with population data!")
     else:
-        user_df = pd.DataFrame(st.session_state.activity_log)
-        user_avg = user_df.mean(numeric_only=True)
+        activity = st.session_state.activity_log
+        user_avg = pd.Series({metric: activity.mean(metric) for metric in ["steps", "calories", "sleep_hours"]})
         # Cleaned average values
         fitbit_avg = pd.Series({
-            "steps": fitbit_df["steps"].mean(),
-            "calories": fitbit_df["calories"].mean(),
-            "sleep_hours": fitbit_df[fitbit_df["sleep_hours"] > 0]["sleep_hours"].mean()
+            "steps": population_mean(population_stats, "steps"),
+            "calories": population_mean(population_stats, "calories"),
+            "sleep_hours": population_mean(population_stats, "sleep_hours")
         })
 
+        # Optionally compare against a slice of the population instead of all of it
+        population_index = data["population_index"]
+        population_filter = show_population_filter(population_index, "compare_filter")
+        if population_filter is not None:
+            ranges, description = population_filter
+            summary = slice_summary(population_index, ranges)
+            if any(np.isnan(summary[metric]) for metric in ["steps", "calories", "sleep_hours"]):
+                st.warning(f"Not enough population data for {description}; comparing with everyone instead.")
+                population_filter = None
+            else:
+                fitbit_avg = pd.Series({metric: summary[metric] for metric in ["steps", "calories", "sleep_hours"]})
+                st.caption(f"Comparing with {summary['days']:,} days from {summary['ids']} participants ({description})")
+
 
         st.markdown("### Your Performance vs. Population Average")
         
@@ -1214,6 +1581,53 @@ elif page == "Compare with Fitbit":
             st.caption(sleep_msg, unsafe_allow_html=True)
 
 
+        # Percentile ranks against the pre-sorted population distributions
+        st.markdown("### 🏅 Where You Rank")
+        comparison_index = load_comparison_index(population_stats["version"], fitbit_df, intensity_df)
+        bmi_category = get_bmi_category(st.session_state.user_profile["bmi"])[0] if st.session_state.user_profile else None
+
+        rank_columns = st.columns(3)
+        for rank_col, metric, label in zip(rank_columns, ["steps", "calories", "sleep_hours"], ["Steps", "Calories", "Sleep"]):
+            with rank_col:
+                if population_filter is None:
+                    rank = percentile_rank(comparison_index, metric, user_avg[metric])
+                else:
+                    rank = slice_percentile_rank(population_index, metric, user_avg[metric], population_filter[0])
+                if np.isnan(rank):
+                    st.metric(f"{label} Percentile", "N/A")
+                    continue
+                st.metric(f"{label} Percentile", ordinal(min(max(rank, 1), 99)), f"Top {max(100 - rank, 1):.0f}%", delta_color="off")
+
+                peer_rank = percentile_rank(comparison_index, metric, user_avg[metric], cohort=("bmi_category", bmi_category))
+                if np.isnan(peer_rank):
+                    st.caption("Not enough population data for your BMI group yet.")
+                else:
+                    st.caption(f"{ordinal(min(max(peer_rank, 1), 99))} percentile among {bmi_category.lower()} peers")
+
+        # Weekly intensity minutes, ranked against the per-Id weekly rollups
+        st.markdown("### ⏱️ Weekly Active Minutes")
+        intensity_stats = data["intensity_stats"]
+        user_minutes = st.number_input("Your moderate-to-vigorous minutes per week (vigorous minutes count double)",
+                                       min_value=0, max_value=5000, value=WHO_WEEKLY_MINUTES, step=10)
+
+        who_col1, who_col2, who_col3 = st.columns(3)
+        with who_col1:
+            if meets_who_target(user_minutes):
+                st.metric("WHO Target", f"{WHO_WEEKLY_MINUTES} min/week", "Met ✅")
+            else:
+                st.metric("WHO Target", f"{WHO_WEEKLY_MINUTES} min/week", f"{user_minutes - WHO_WEEKLY_MINUTES} min", delta_color="normal")
+        with who_col2:
+            rank = percentile_rank(intensity_stats, "moderate_equivalent", user_minutes)
+            st.metric("Active Minutes Percentile", "N/A" if np.isnan(rank) else ordinal(min(max(rank, 1), 99)))
+        with who_col3:
+            compliance = who_compliance(intensity_stats)
+            st.metric("Population Meeting WHO", "N/A" if np.isnan(compliance) else f"{compliance * 100:.0f}%")
+
+        breakdown = intensity_breakdown(intensity_stats)
+        if not np.isnan(breakdown["SedentaryMinutes"]):
+            show_cached_chart(POPULATION_OWNER, population_stats["version"], "intensity_breakdown", lambda: build_intensity_chart(breakdown))
+            st.caption(f"The average Fitbit user also spends {breakdown['SedentaryMinutes'] / 60:.0f} hours a week sedentary.")
+
         # Performance insights
         st.markdown("### 📊 Performance Insights")
         
@@ -1255,64 +1669,16 @@ elif page == "Compare with Fitbit":
         with chart_col1:
             st.markdown("#### 👤 Your Activity Data")
             
-            # Prepare your data for visualization
-            user_chart_data = pd.DataFrame({
-                "Metric": ["Steps", "Calories", "Sleep Hours"],
-                "Value": [user_avg["steps"], user_avg["calories"], user_avg["sleep_hours"]],
-                "Color": ["#667eea", "#667eea", "#667eea"]
-            })
-            
-            # Your data chart
-            user_chart = alt.Chart(user_chart_data).mark_bar(
-                color="#667eea",
-                strokeWidth=2,
-                stroke="#5a67d8"
-            ).encode(
-                x=alt.X("Metric:N", title="Metrics", axis=alt.Axis(labelAngle=0)),
-                y=alt.Y("Value:Q", title="Average Value"),
-                tooltip=["Metric:N", alt.Tooltip("Value:Q", format=".1f")]
-            ).properties(
-                width=300,
-                height=400,
-                title=alt.TitleParams(
-                    text="Your Averages",
-                    fontSize=16,
-                    fontWeight="bold"
-                )
-            )
-            
-            st.altair_chart(user_chart, use_container_width=True)
+            show_cached_chart(st.session_state.user['email'], get_user_activity_store().version(), "user_averages",
+                              lambda: build_averages_chart(user_avg, "Your Averages", "#667eea", "#5a67d8"))
         
         with chart_col2:
             st.markdown("#### 👥 Population Average Data")
             
-            # Prepare population data for visualization
-            pop_chart_data = pd.DataFrame({
-                "Metric": ["Steps", "Calories", "Sleep Hours"],
-                "Value": [fitbit_avg["steps"], fitbit_avg["calories"], fitbit_avg["sleep_hours"]],
-                "Color": ["#764ba2", "#764ba2", "#764ba2"]
-            })
-            
-            # Population data chart
-            pop_chart = alt.Chart(pop_chart_data).mark_bar(
-                color="#764ba2",
-                strokeWidth=2,
-                stroke="#6b46c1"
-            ).encode(
-                x=alt.X("Metric:N", title="Metrics", axis=alt.Axis(labelAngle=0)),
-                y=alt.Y("Value:Q", title="Average Value"),
-                tooltip=["Metric:N", alt.Tooltip("Value:Q", format=".1f")]
-            ).properties(
-                width=300,
-                height=400,
-                title=alt.TitleParams(
-                    text="Population Averages", 
-                    fontSize=16,
-                    fontWeight="bold"
-                )
-            )
-            
-            st.altair_chart(pop_chart, use_container_width=True)
+            # A filtered comparison charts the slice's averages, so each slice gets its own cached spec
+            averages_kind = "population_averages" if population_filter is None else f"population_averages[{slice_key(population_filter[0])}]"
+            show_cached_chart(POPULATION_OWNER, population_stats["version"], averages_kind,
+                              lambda: build_averages_chart(fitbit_avg, "Population Averages", "#764ba2", "#6b46c1"))
         
         # Additional health recommendations
         st.markdown("### 💡 Personalized Recommendations")
@@ -1340,4 +1706,49 @@ elif page == "Compare with Fitbit":
             recommendations.append("✅ **Well Balanced**: You're maintaining good health habits across all metrics!")
         
         for rec in recommendations:
-            st.success(rec)
\ No newline at end of file
+            st.success(rec)
+
+# page name -> (render function, data it needs)
+PAGES = {
+    "User Profile": (show_profile_page, ["activity", "weight"]),
+    "Activity Logger": (show_activity_logger_page, ["activity"]),
+    "Health Insights": (show_health_insights_page, ["population"]),
+    "Compare with Fitbit": (show_compare_page, ["activity", "population"])
+}
+
+# Sidebar
+logo_path =  "logo.jpg"
+with st.sidebar:
+    if os.path.exists(logo_path):
+        try:
+            st.image(load_logo_asset(logo_path, os.stat(logo_path).st_mtime_ns), use_container_width=True)
+        except Exception as e:
+            st.write("WELLNEST")
+    else:
+        st.markdown("## WellNest")
+
+    st.markdown(f"### Welcome, {st.session_state.user_profile['username'] if st.session_state.user_profile else 'User'}! 👋")
+    
+    page = st.radio("Navigate", list(PAGES))
+    st.sidebar.markdown("---")
+
+    if st.sidebar.button("Log out"):
+        st.session_state.user = None
+        st.session_state.user_profile = None
+        st.session_state.activity_log = ActivityFrame()
+        st.session_state.awarded_badges = set()
+        st.session_state.badge_state = None
+        st.session_state.user_metrics = None
+        st.session_state.user_metrics_version = None
+        st.session_state.new_badges_to_show = []
+        st.rerun()
+
+startup_profile.mark("sidebar")
+
+render_page, page_needs = PAGES[page]
+page_data = {}
+for need in page_needs:
+    page_data.update(PAGE_DATA_LOADERS[need]())
+    startup_profile.mark(f"{need} data")
+render_page(page_data)
+show_startup_profile(f"{page} page")
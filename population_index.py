@@ -0,0 +1,188 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from fitbit_cache import load_or_build, read_arrow, write_arrow
+from fitbit_ingest import weekdays
+
+INDEX_METRICS = ["steps", "calories", "sleep_hours"]
+
+# Day selections -> day types (0 = weekday, 1 = weekend) they cover
+DAY_TYPES = {"all": [0, 1], "weekdays": [0], "weekends": [1]}
+
+# Days are stored offset by 2**31 so every date fits the low 32 bits of a key
+_DAY_BIAS = 2 ** 31
+
+
+def _epoch_days(dates):
+    return np.asarray(dates).astype("datetime64[D]").astype("int64")
+
+
+def _day_types(days):
+    # Saturday and Sunday are weekdays 5 and 6
+    return (weekdays(days) >= 5).astype("int64")
+
+
+def _keys(groups, days):
+    return (np.asarray(groups, dtype="int64") << 32) | (np.asarray(days, dtype="int64") + _DAY_BIAS)
+
+
+def build_population_index(merged_df):
+    """Merged rows sorted by (Id, day type, date), with one int64 key per row to binary-search on
+
+    Each key packs the Id's rank among the sorted Ids, whether the day is a
+    weekend and the date, so every (Id, day type) run of rows is contiguous
+    and ordered by date.
+    """
+    if merged_df is None or merged_df.empty:
+        return pd.DataFrame({"key": np.array([], dtype="int64"), "Id": np.array([], dtype="int64"),
+                             **{metric: np.array([], dtype="float32") for metric in INDEX_METRICS}})
+    ids = np.asarray(merged_df["Id"].to_numpy(), dtype="int64")
+    days = _epoch_days(merged_df["date"].to_numpy())
+    ranks = np.searchsorted(np.unique(ids), ids)
+    keys = _keys(ranks * 2 + _day_types(days), days)
+    order = np.argsort(keys, kind="stable")
+    rows = pd.DataFrame({"key": keys[order], "Id": ids[order]})
+    for metric in INDEX_METRICS:
+        rows[metric] = merged_df[metric].to_numpy(dtype="float32", na_value=np.nan)[order]
+    return rows
+
+
+def update_population_index(rows, merged_delta):
+    """Merge newly arrived merged rows into sorted index rows without re-sorting them
+
+    New Ids shift the ranks packed into the keys, but ranks stay in Id
+    order, so re-keying the old rows keeps them sorted and the sorted delta
+    is inserted at its binary-searched positions.
+    """
+    if merged_delta is None or merged_delta.empty:
+        return rows
+    delta = build_population_index(merged_delta)
+    old_ids, new_ids = rows["Id"].to_numpy(), delta["Id"].to_numpy()
+    unique_ids = np.union1d(old_ids, new_ids)
+    old_days = (rows["key"].to_numpy() & 0xFFFFFFFF) - _DAY_BIAS
+    new_days = (delta["key"].to_numpy() & 0xFFFFFFFF) - _DAY_BIAS
+    old_keys = _keys(np.searchsorted(unique_ids, old_ids) * 2 + _day_types(old_days), old_days)
+    new_keys = _keys(np.searchsorted(unique_ids, new_ids) * 2 + _day_types(new_days), new_days)
+    order = np.argsort(new_keys, kind="stable")
+    positions = np.searchsorted(old_keys, new_keys[order])
+    merged = pd.DataFrame({"key": np.insert(old_keys, positions, new_keys[order]),
+                           "Id": np.insert(old_ids, positions, new_ids[order])})
+    for metric in INDEX_METRICS:
+        merged[metric] = np.insert(rows[metric].to_numpy(), positions, delta[metric].to_numpy()[order])
+    return merged
+
+
+def read_population_index_rows(directory, zero_copy=False):
+    """Read the sorted index rows saved for a dataset version; raises OSError if they are missing"""
+    return read_arrow(os.path.join(directory, "population_index.arrow"), zero_copy)
+
+
+def _population_index(rows, version):
+    keys = rows["key"].to_numpy()
+    ids = rows["Id"].to_numpy()
+    unique_ids = ids[np.r_[True, ids[1:] != ids[:-1]]] if len(ids) else ids
+    days = (keys & 0xFFFFFFFF) - _DAY_BIAS
+    return {
+        "version": version,
+        "keys": keys,
+        "ids": unique_ids,
+        # Rows of the Id ranked r are offsets[r]:offsets[r + 1]
+        "offsets": np.searchsorted(keys, np.arange(len(unique_ids) + 1, dtype="int64") << 33),
+        "first_day": np.datetime64(int(days.min()), "D") if len(days) else None,
+        "last_day": np.datetime64(int(days.max()), "D") if len(days) else None,
+        "values": {metric: rows[metric].to_numpy() for metric in INDEX_METRICS},
+    }
+
+
+def compute_population_index(merged_df, version=None):
+    """Index the merged population rows in memory"""
+    return _population_index(build_population_index(merged_df), version)
+
+
+def slice_ranges(index, start=None, end=None, days="all", ids=None):
+    """(starts, ends) row ranges of the rows within [start, end], on the given day types, of the given Ids
+
+    Both arrays have one row per Id and one column per day type. Each bound
+    is found by binary search on the index keys, so the cost grows with the
+    number of Ids, not rows. Ids missing from the index are ignored.
+    """
+    ranks = np.arange(len(index["ids"]), dtype="int64")
+    if ids is not None:
+        ids = np.asarray(ids, dtype="int64")
+        positions = np.searchsorted(index["ids"], ids)
+        found = positions < len(index["ids"])
+        found[found] = index["ids"][positions[found]] == ids[found]
+        ranks = np.unique(positions[found])
+    groups = ranks[:, None] * 2 + np.array(DAY_TYPES[days], dtype="int64")
+    first = -_DAY_BIAS if start is None else _epoch_days(start)
+    last = _DAY_BIAS - 1 if end is None else _epoch_days(end)
+    starts = np.searchsorted(index["keys"], _keys(groups, first), side="left")
+    ends = np.searchsorted(index["keys"], _keys(groups, last), side="right")
+    return starts, ends
+
+
+def slice_key(ranges):
+    """Short digest identifying the rows a slice covers, for caching what is derived from it"""
+    starts, ends = (np.ascontiguousarray(bounds, dtype="int64") for bounds in ranges)
+    return hashlib.sha256(starts.tobytes() + ends.tobytes()).hexdigest()[:16]
+
+
+def slice_rows(ranges):
+    """Row positions covered by (starts, ends) ranges"""
+    starts, ends = (bounds.ravel() for bounds in ranges)
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.array([], dtype="int64")
+    # Each range's rows are its start plus 0..length-1, laid end to end
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(total)
+
+
+def slice_values(index, metric, ranges):
+    """Non-missing values of a metric in the sliced rows; sleep only counts nights with sleep logged"""
+    values = index["values"][metric][slice_rows(ranges)].astype("float64")
+    values = values[~np.isnan(values)]
+    if metric == "sleep_hours":
+        values = values[values > 0]
+    return values
+
+
+def slice_summary(index, ranges):
+    """Days, Ids and mean of each metric within a slice"""
+    per_id = (ranges[1] - ranges[0]).sum(axis=1)
+    summary = {"days": int(per_id.sum()), "ids": int(np.count_nonzero(per_id))}
+    for metric in INDEX_METRICS:
+        values = slice_values(index, metric, ranges)
+        summary[metric] = float(values.mean()) if len(values) else float("nan")
+    return summary
+
+
+def slice_percentile_rank(index, metric, value, ranges):
+    """Percentage of the sliced days at or below value (ties count half), or NaN for an empty slice"""
+    values = slice_values(index, metric, ranges)
+    if len(values) == 0:
+        return float("nan")
+    # One pass over the slice is cheaper than sorting it for a single lookup
+    return float((np.count_nonzero(values < value) + np.count_nonzero(values <= value)) / 2 / len(values) * 100)
+
+
+def save_population_index(rows, directory):
+    """Materialize the sorted rows next to the cached tables of their dataset version"""
+    write_arrow(rows, os.path.join(directory, "population_index.arrow"))
+
+
+def load_population_index(directory, merged_df, zero_copy=False):
+    """Load the index for a dataset version, building and saving it on first use"""
+    if directory is None:
+        return compute_population_index(merged_df)
+    rows = load_or_build(
+        directory,
+        lambda: read_population_index_rows(directory, zero_copy),
+        lambda: build_population_index(merged_df),
+        lambda built: save_population_index(built, directory),
+    )
+    return _population_index(rows, os.path.basename(directory))
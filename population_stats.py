@@ -0,0 +1,225 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from fitbit_cache import load_or_build, read_activity_daily, read_arrow, write_arrow
+from fitbit_ingest import DAILY_ACTIVITY_COLUMNS, add_sums, daily_activity_sums
+
+# metric name -> (table, column); merged sleep only counts nights with sleep logged
+POPULATION_METRICS = {
+    "steps": ("merged", "steps"),
+    "calories": ("merged", "calories"),
+    "sleep_hours": ("merged", "sleep_hours"),
+    "logged_sleep_hours": ("sleep", "sleep_hours"),
+}
+
+PERCENTILES = [10, 25, 50, 75, 90]
+
+# Daily view columns, named as in daily_health_averages.csv; activity columns come from
+# the per-date sums of every activity row, since merged drops the days without sleep
+DAILY_COLUMNS = {
+    "TotalSteps": ("activity", "steps"),
+    "Calories": ("activity", "calories"),
+    "VeryActiveMinutes": ("intensity", "VeryActiveMinutes"),
+    "FairlyActiveMinutes": ("intensity", "FairlyActiveMinutes"),
+    "LightlyActiveMinutes": ("intensity", "LightlyActiveMinutes"),
+    "SedentaryMinutes": ("intensity", "SedentaryMinutes"),
+    "TotalMinutesAsleep": ("sleep", "TotalMinutesAsleep"),
+    "TotalTimeInBed": ("sleep", "TotalTimeInBed"),
+}
+
+PER_ID_METRICS = ["steps", "calories", "sleep_hours"]
+
+
+def _metric_values(tables, table, column):
+    df = tables.get(table)
+    if df is None or column not in df:
+        return np.array([], dtype="float64")
+    values = df[column].to_numpy(dtype="float64", na_value=np.nan)
+    values = values[~np.isnan(values)]
+    if column == "sleep_hours":
+        values = values[values > 0]
+    return values
+
+
+def _summarize(sorted_values):
+    if len(sorted_values) == 0:
+        return {"count": 0, "sum": 0.0, "mean": float("nan"), "percentiles": {str(p): float("nan") for p in PERCENTILES}}
+    return {
+        "count": int(len(sorted_values)),
+        "sum": float(sorted_values.sum()),
+        "mean": float(sorted_values.mean()),
+        "percentiles": {str(p): float(v) for p, v in zip(PERCENTILES, np.percentile(sorted_values, PERCENTILES))},
+    }
+
+
+def _daily_sums(tables, activity_daily):
+    """Per-date sums and counts for each daily column, taking the activity ones from activity_daily"""
+    parts = [] if activity_daily is None or activity_daily.empty else [activity_daily]
+    for name, (table, column) in DAILY_COLUMNS.items():
+        df = tables.get(table)
+        if name in DAILY_ACTIVITY_COLUMNS or df is None or column not in df or df.empty:
+            continue
+        grouped = df.groupby(df["date"].dt.normalize())[column].agg(["sum", "count"])
+        parts.append(grouped.rename(columns={"sum": f"{name}_sum", "count": f"{name}_count"}))
+    if not parts:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="date"))
+    return pd.concat(parts, axis=1).fillna(0)
+
+
+def _per_id_sums(merged_df):
+    """Per-Id sums and counts of the merged metrics"""
+    if merged_df is None or merged_df.empty:
+        return pd.DataFrame(index=pd.Index([], name="Id"))
+    # Grouped on the plain Id values so views of categorical and int64 Ids line up
+    grouped = merged_df[PER_ID_METRICS].groupby(merged_df["Id"].to_numpy()).agg(["sum", "count"])
+    grouped.columns = [f"{metric}_{stat}" for metric, stat in grouped.columns]
+    grouped.index.name = "Id"
+    return grouped
+
+
+def _sorted_merge(sorted_values, new_values):
+    new_values = np.sort(new_values)
+    return np.insert(sorted_values, np.searchsorted(sorted_values, new_values), new_values)
+
+
+def compute_population_view(merged_df, intensity_df, sleep_df, version=None, activity_daily=None):
+    """Compute every population aggregate the pages need, once
+
+    activity_daily holds the per-date activity sums of the dataset; without
+    it they are taken from the merged rows, as for the bundled sample data.
+    """
+    tables = {"merged": merged_df, "intensity": intensity_df, "sleep": sleep_df}
+    if activity_daily is None:
+        activity_daily = daily_activity_sums(merged_df)
+    sorted_values = {name: np.sort(_metric_values(tables, *source)) for name, source in POPULATION_METRICS.items()}
+    return {
+        "version": version,
+        "metrics": {name: _summarize(values) for name, values in sorted_values.items()},
+        "sorted": sorted_values,
+        "daily": _daily_sums(tables, activity_daily),
+        "per_id": _per_id_sums(merged_df),
+    }
+
+
+def update_population_view(view, merged_delta=None, intensity_delta=None, sleep_delta=None, version=None,
+                           activity_daily_delta=None):
+    """Fold newly arrived population rows, and the per-date sums of the new activity rows, into an existing view"""
+    tables = {"merged": merged_delta, "intensity": intensity_delta, "sleep": sleep_delta}
+    if activity_daily_delta is None:
+        activity_daily_delta = daily_activity_sums(merged_delta)
+    sorted_values = {
+        name: _sorted_merge(view["sorted"][name], _metric_values(tables, *source))
+        for name, source in POPULATION_METRICS.items()
+    }
+    return {
+        "version": version,
+        "metrics": {name: _summarize(values) for name, values in sorted_values.items()},
+        "sorted": sorted_values,
+        "daily": add_sums(view["daily"], _daily_sums(tables, activity_daily_delta)),
+        "per_id": add_sums(view["per_id"], _per_id_sums(merged_delta)),
+    }
+
+
+def population_mean(view, metric):
+    """Population mean of a metric"""
+    return view["metrics"][metric]["mean"]
+
+
+def population_percentile(view, metric, percentile):
+    """Precomputed population percentile (one of PERCENTILES) of a metric"""
+    return view["metrics"][metric]["percentiles"][str(percentile)]
+
+
+def daily_averages(view):
+    """Per-date averages in the daily_health_averages.csv layout"""
+    daily = view["daily"]
+    averages = pd.DataFrame(index=daily.index)
+    for name in DAILY_COLUMNS:
+        if f"{name}_sum" in daily:
+            counts = daily[f"{name}_count"].where(daily[f"{name}_count"] > 0)
+            averages[name] = daily[f"{name}_sum"] / counts
+        else:
+            averages[name] = np.nan
+    averages.index.name = "ActivityDate"
+    return averages.sort_index().reset_index()
+
+
+def per_id_summary(view):
+    """Per-Id entry counts and averages of the merged metrics"""
+    per_id = view["per_id"]
+    summary = pd.DataFrame(index=per_id.index)
+    for metric in PER_ID_METRICS:
+        if f"{metric}_count" in per_id:
+            summary[f"{metric}_count"] = per_id[f"{metric}_count"].astype("int64")
+            summary[f"{metric}_mean"] = per_id[f"{metric}_sum"] / per_id[f"{metric}_count"].where(per_id[f"{metric}_count"] > 0)
+    return summary.reset_index()
+
+
+def save_population_view(view, directory):
+    """Materialize the view next to the cached tables of its dataset version"""
+    write_arrow(view["daily"].reset_index(), os.path.join(directory, "daily.arrow"))
+    write_arrow(view["per_id"].reset_index(), os.path.join(directory, "per_id.arrow"))
+    for name, values in view["sorted"].items():
+        np.save(os.path.join(directory, f"sorted_{name}.npy"), values)
+    # The stats file goes last so a half-written view is never picked up
+    tmp_path = os.path.join(directory, f"population_stats.json.{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump({"version": view["version"], "metrics": view["metrics"]}, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, "population_stats.json"))
+
+
+def read_population_view(directory, zero_copy=False):
+    """Read the view saved for a dataset version; raises if it is missing or stale"""
+    version = os.path.basename(directory)
+    with open(os.path.join(directory, "population_stats.json"), 'r') as f:
+        stats = json.load(f)
+    if stats["version"] != version:
+        raise ValueError("stale population view")
+    return {
+        "version": version,
+        "metrics": stats["metrics"],
+        "sorted": {name: np.load(os.path.join(directory, f"sorted_{name}.npy"), mmap_mode='r') for name in POPULATION_METRICS},
+        "daily": read_arrow(os.path.join(directory, "daily.arrow"), zero_copy).set_index("date"),
+        "per_id": read_arrow(os.path.join(directory, "per_id.arrow"), zero_copy).set_index("Id"),
+    }
+
+
+def _version_activity_daily(directory):
+    try:
+        return read_activity_daily(directory)
+    except OSError:
+        # Pruned by a newer build; its view is only served until the workers move on and is never saved
+        return None
+
+
+def load_population_view(directory, merged_df, intensity_df, sleep_df, zero_copy=False):
+    """Load the materialized view for a dataset version, computing and saving it on first use"""
+    if directory is None:
+        return compute_population_view(merged_df, intensity_df, sleep_df)
+    return load_or_build(
+        directory,
+        lambda: read_population_view(directory, zero_copy),
+        lambda: compute_population_view(merged_df, intensity_df, sleep_df, version=os.path.basename(directory),
+                                        activity_daily=_version_activity_daily(directory)),
+        lambda view: save_population_view(view, directory),
+        errors=(OSError, ValueError, KeyError),
+    )
+
+
+if __name__ == "__main__":
+    from fitbit_cache import build_fitbit_cache, load_fitbit_version
+
+    parser = argparse.ArgumentParser(description="Export the per-date population averages of the cached Fitbit data")
+    parser.add_argument("data_dir", nargs="?", default=".")
+    parser.add_argument("--output", help="CSV to write; defaults to daily_health_averages.csv in the cache version directory")
+    args = parser.parse_args()
+
+    version_dir = build_fitbit_cache(args.data_dir)
+    view = load_population_view(version_dir, *load_fitbit_version(version_dir))
+    output = args.output or os.path.join(version_dir, "daily_health_averages.csv")
+    daily_averages(view).to_csv(output, index=False)
+    print(f"Population view {view['version']} written to {output}")
@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Set WELLNEST_CHECK_SHARED_FRAMES=1 to also compare column buffers on every check (slower)
+DEEP_CHECKS = os.getenv("WELLNEST_CHECK_SHARED_FRAMES") == "1"
+
+
+def _read_only(values):
+    view = values.view()
+    view.flags.writeable = False
+    return view
+
+
+def freeze_frame(df):
+    """A DataFrame over read-only views of df's numpy columns; writing a value into it raises ValueError
+
+    Columns are not copied. Extension-typed columns (strings, categoricals)
+    are kept as they are.
+    """
+    columns = {}
+    for column in df.columns:
+        series = df[column]
+        columns[column] = _read_only(series.to_numpy()) if isinstance(series.dtype, np.dtype) else series.array
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def frame_signature(df, deep=False):
+    """Identity of a frame's columns, rows and index, plus its column buffers when deep, to detect in-place changes"""
+    signature = (tuple(df.columns), len(df), id(df.index))
+    if not deep:
+        return signature
+    buffers = tuple(
+        df[column].to_numpy().__array_interface__["data"][0] if isinstance(df[column].dtype, np.dtype) else None
+        for column in df.columns
+    )
+    return signature + (buffers,)
+
+
+class SharedFrames:
+    """Read-only frames that every session references instead of receiving its own copy
+
+    Writing a value into a shared frame raises ValueError. In-place
+    structural changes (adding, replacing or dropping columns, inplace
+    sorts) cannot be blocked, so check() compares each frame against the
+    signature taken when it was shared and raises if one was changed.
+    Replacing a column with one of the same name is only caught by deep
+    checks.
+    """
+
+    def __init__(self, frames, deep=DEEP_CHECKS):
+        self.deep = deep
+        self.frames = tuple(freeze_frame(df) for df in frames)
+        self._signatures = [frame_signature(df, deep) for df in self.frames]
+
+    def check(self):
+        """Return the frames, raising RuntimeError if any was modified in place"""
+        for position, (df, signature) in enumerate(zip(self.frames, self._signatures)):
+            if frame_signature(df, self.deep) != signature:
+                raise RuntimeError(f"Shared frame {position} was modified in place; copy it before changing it")
+        return self.frames
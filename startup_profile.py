@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+import time
+
+# Set WELLNEST_PROFILE_STARTUP=1 to show phase timings in the app
+PROFILE_STARTUP = os.getenv("WELLNEST_PROFILE_STARTUP") == "1"
+
+# Script runs seen by this process; the first one is the cold start
+_runs = 0
+
+
+class StartupProfile:
+    """Wall-clock timings of the phases of one script run"""
+
+    def __init__(self, start=None):
+        global _runs
+        _runs += 1
+        self.cold = _runs == 1
+        self.start = time.perf_counter() if start is None else start
+        self._last = self.start
+        self.phases = []
+
+    def mark(self, name):
+        """Record the time since the previous mark as the phase name"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def total(self):
+        return self._last - self.start
+
+    def lines(self):
+        """Human-readable report, one phase per line"""
+        lines = [f"{name}: {seconds * 1000:.1f} ms" for name, seconds in self.phases]
+        lines.append(f"total ({'cold' if self.cold else 'warm'} run): {self.total() * 1000:.1f} ms")
+        return lines
+
+
+def parse_importtime(output):
+    """Parse `python -X importtime` output into (module, depth, self_s, cumulative_s) rows"""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return rows
+
+
+def import_timings(modules, cwd=None):
+    """Cumulative import time of each module, measured in a fresh interpreter
+
+    Modules are imported in order, so each one only pays for what the
+    earlier ones did not already load; None means it was already loaded.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "; ".join(f"import {module}" for module in modules)],
+        capture_output=True, text=True, cwd=cwd, check=True,
+    )
+    top_level = {name: cumulative for name, depth, _, cumulative in parse_importtime(result.stderr) if depth == 0}
+    return [(module, top_level.get(module)) for module in modules]
+
+
+if __name__ == "__main__":
+    modules = sys.argv[1:] or ["streamlit", "numpy", "pandas", "pyarrow", "altair", "PIL.Image", "smtplib", "email.mime.multipart"]
+    for module, seconds in import_timings(modules):
+        print(f"{module:<24} {'(already loaded)' if seconds is None else f'{seconds * 1000:8.1f} ms'}")
@@ -0,0 +1,197 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+
+# Output files, named and laid out like the Fitbit export
+SYNTHETIC_FILES = {
+    "activity": "dailyActivity_merged.csv",
+    "intensity": "dailyIntensities_merged.csv",
+    "sleep": "sleepDay_merged.csv",
+    "weight": "weightLogInfo_merged.csv",
+}
+
+# Users generated and written per chunk, bounding memory for any population size
+CHUNK_USERS = 2000
+
+# Shares of users who ever log sleep or weight, as in the Fitbit export (24/35 and 11/35)
+SLEEP_LOGGER_SHARE = 0.7
+WEIGHT_LOGGER_SHARE = 0.3
+
+FIRST_ID = 1_000_000_000
+
+
+def _day_strings(dates, time_of_day=""):
+    # Fitbit writes unpadded month/day, e.g. 4/5/2016
+    return np.array([f"{d.month}/{d.day}/{d.year}{time_of_day}" for d in dates], dtype=object)
+
+
+def generate_chunk(rng, first_user, users, dates):
+    """Generate (activity, intensity, sleep, weight) export frames for users over dates
+
+    Each user gets a latent activity level, stride, body size and logging
+    habits; days then vary around them, so steps, active minutes, distance
+    and calories move together, and only some users log sleep or weight.
+    """
+    days = len(dates)
+    ids = FIRST_ID + first_user + np.arange(users)
+    user = np.repeat(np.arange(users), days)
+    day = np.tile(np.arange(days), users)
+    rows = users * days
+
+    # Per-user traits
+    activity_level = rng.lognormal(0.0, 0.45, users)
+    height_m = rng.normal(1.70, 0.09, users).clip(1.45, 2.05)
+    weight_kg = (rng.normal(25.5, 4.5, users).clip(17, 45) * height_m ** 2)
+    stride_km = 0.00041 * height_m * rng.normal(1.0, 0.05, users)
+    bmr = 10 * weight_kg + 625 * height_m - 5 * rng.integers(20, 65, users) + rng.choice([-161, 5], users)
+    non_wear = rng.beta(1.0, 8.0, users)
+
+    # Daily activity: weekends are a little lazier, some days the tracker is not worn
+    weekday = np.asarray(dates.dayofweek)[day]
+    steps = 7500 * activity_level[user] * rng.lognormal(-0.06, 0.35, rows) * np.where(weekday >= 5, 0.85, 1.0)
+    worn = rng.random(rows) >= non_wear[user]
+    steps = np.where(worn, steps.clip(0, 40000), 0).astype("int64")
+
+    very_active = np.where(worn, (np.maximum(steps - 6000, 0) / 350 * rng.lognormal(0, 0.5, rows)).clip(0, 240), 0).astype("int64")
+    fairly_active = np.where(worn, (steps / 900 * rng.lognormal(0, 0.6, rows)).clip(0, 150), 0).astype("int64")
+    lightly_active = np.where(worn, (steps / 40 * rng.lognormal(0, 0.3, rows)).clip(0, 520), 0).astype("int64")
+
+    # Sleep: loggers record a user-specific share of nights, and some stop partway through
+    sleep_logger = rng.random(users) < SLEEP_LOGGER_SHARE
+    log_rate = rng.beta(1.2, 0.6, users)
+    last_logged = np.where(rng.random(users) < 0.3, rng.integers(1, days + 1, users), days)
+    logged = sleep_logger[user] & (rng.random(rows) < log_rate[user]) & (day < last_logged[user]) & worn
+    asleep = (rng.normal(430, 70, rows) + 25 * np.log(activity_level[user])).clip(60, 800).astype("int64")
+    in_bed = asleep + rng.gamma(2.0, 20.0, rows).astype("int64")
+    sleep_records = 1 + (rng.random(rows) < 0.1) + (rng.random(rows) < 0.01)
+
+    active = very_active + fairly_active + lightly_active
+    sedentary = np.where(worn, 1440 - active - np.where(logged, in_bed, 0), 1440).clip(0, 1440)
+
+    # Distances in km, split by how fast each intensity covers ground
+    total_distance = steps * stride_km[user]
+    speed_weighted = 3.0 * very_active + 2.0 * fairly_active + 1.0 * lightly_active
+    share = np.divide(total_distance, speed_weighted, out=np.zeros(rows), where=speed_weighted > 0)
+    very_distance, moderate_distance, light_distance = 3.0 * very_active * share, 2.0 * fairly_active * share, lightly_active * share
+    sedentary_distance = np.where(rng.random(rows) < 0.05, rng.uniform(0, 0.05, rows), 0.0)
+    logged_distance = np.where(rng.random(rows) < 0.03, rng.uniform(0.5, 5, rows), 0.0)
+
+    calories = (1.15 * bmr[user] * rng.normal(1.0, 0.04, rows) + 0.03 * steps * weight_kg[user] / 70
+                + 6 * very_active + 3 * fairly_active + 1 * lightly_active).astype("int64")
+
+    activity_day = _day_strings(dates)[day]
+    activity_df = pd.DataFrame({
+        "Id": ids[user],
+        "ActivityDate": activity_day,
+        "TotalSteps": steps,
+        "TotalDistance": total_distance.round(2),
+        "TrackerDistance": total_distance.round(2),
+        "LoggedActivitiesDistance": logged_distance.round(2),
+        "VeryActiveDistance": very_distance.round(2),
+        "ModeratelyActiveDistance": moderate_distance.round(2),
+        "LightActiveDistance": light_distance.round(2),
+        "SedentaryActiveDistance": sedentary_distance.round(2),
+        "VeryActiveMinutes": very_active,
+        "FairlyActiveMinutes": fairly_active,
+        "LightlyActiveMinutes": lightly_active,
+        "SedentaryMinutes": sedentary,
+        "Calories": calories,
+    })
+    intensity_df = pd.DataFrame({
+        "Id": ids[user],
+        "ActivityDay": activity_day,
+        "SedentaryMinutes": sedentary,
+        "LightlyActiveMinutes": lightly_active,
+        "FairlyActiveMinutes": fairly_active,
+        "VeryActiveMinutes": very_active,
+        "SedentaryActiveDistance": sedentary_distance.round(2),
+        "LightActiveDistance": light_distance.round(2),
+        "ModeratelyActiveDistance": moderate_distance.round(2),
+        "VeryActiveDistance": very_distance.round(2),
+    })
+    sleep_df = pd.DataFrame({
+        "Id": ids[user][logged],
+        "SleepDay": _day_strings(dates, " 12:00:00 AM")[day[logged]],
+        "TotalSleepRecords": sleep_records[logged],
+        "TotalMinutesAsleep": asleep[logged],
+        "TotalTimeInBed": in_bed[logged],
+    })
+
+    # Weight: a few users weigh in, mostly by hand, drifting slowly around their usual weight
+    weight_logger = rng.random(users) < WEIGHT_LOGGER_SHARE
+    weigh_rate = rng.beta(0.8, 3.0, users)
+    manual = rng.random(users) < 0.7
+    weighed = weight_logger[user] & (rng.random(rows) < weigh_rate[user])
+    weighed_user, weighed_day = user[weighed], day[weighed]
+    changes = rng.normal(0, 0.15, len(weighed_user))
+    drift = np.cumsum(changes)
+    starts = np.flatnonzero(np.diff(weighed_user, prepend=-1) != 0)
+    drift -= np.repeat(drift[starts] - changes[starts], np.diff(np.r_[starts, len(weighed_user)]))
+    kg = (weight_kg[weighed_user] + drift).round(1)
+    has_fat = rng.random(len(kg)) < 0.06
+    log_time = np.asarray(dates[weighed_day], dtype="datetime64[s]") + np.timedelta64(86399, "s")
+    weight_df = pd.DataFrame({
+        "Id": ids[weighed_user],
+        "Date": _day_strings(dates, " 11:59:59 PM")[weighed_day],
+        "WeightKg": kg,
+        "WeightPounds": (kg * 2.20462262).round(6),
+        "Fat": np.where(has_fat, rng.integers(15, 30, len(kg)), np.nan),
+        "BMI": (kg / height_m[weighed_user] ** 2).round(2),
+        "IsManualReport": np.where(manual[weighed_user], "True", "False"),
+        "LogId": log_time.astype("int64") * 1000,
+    })
+    return activity_df, intensity_df, sleep_df, weight_df
+
+
+def iter_population(users, days=31, start="2016-04-12", seed=42, chunk_users=CHUNK_USERS):
+    """Yield (activity, intensity, sleep, weight) frames for chunk_users users at a time
+
+    The output depends on the seed and chunk size, not on how much of it is consumed.
+    """
+    dates = pd.date_range(start=start, periods=days, freq="D")
+    first_users = range(0, users, chunk_users)
+    for first_user, chunk_seed in zip(first_users, np.random.SeedSequence(seed).spawn(len(first_users))):
+        rng = np.random.default_rng(chunk_seed)
+        yield generate_chunk(rng, first_user, min(chunk_users, users - first_user), dates)
+
+
+def write_population(out_dir, users, days=31, start="2016-04-12", seed=42, chunk_users=CHUNK_USERS):
+    """Stream a synthetic population to Fitbit-format CSVs in out_dir; returns the row counts written"""
+    os.makedirs(out_dir, exist_ok=True)
+    sinks, writers = {}, {}
+    counts = dict.fromkeys(SYNTHETIC_FILES, 0)
+    try:
+        for frames in iter_population(users, days, start, seed, chunk_users):
+            for name, df in zip(SYNTHETIC_FILES, frames):
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if name not in writers:
+                    # Arrow quotes header names, so the (unquoted) Fitbit-style header is written here
+                    sinks[name] = pa.OSFile(os.path.join(out_dir, SYNTHETIC_FILES[name]), 'wb')
+                    sinks[name].write((",".join(table.column_names) + "\n").encode())
+                    writers[name] = pa_csv.CSVWriter(sinks[name], table.schema, write_options=pa_csv.WriteOptions(
+                        include_header=False, quoting_style="none"))
+                writers[name].write_table(table)
+                counts[name] += len(df)
+    finally:
+        for name, writer in writers.items():
+            writer.close()
+            sinks[name].close()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic Fitbit-format population")
+    parser.add_argument("out_dir")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--start", default="2016-04-12")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-users", type=int, default=CHUNK_USERS)
+    args = parser.parse_args()
+
+    counts = write_population(args.out_dir, args.users, args.days, args.start, args.seed, args.chunk_users)
+    print(", ".join(f"{count:,} {name} rows" for name, count in counts.items()))
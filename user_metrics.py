@@ -0,0 +1,114 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+METRICS = ["steps", "calories", "sleep_hours"]
+
+# Day windows shown in the rolling averages table
+ROLLING_WINDOWS = [7, 30, 90]
+EWMA_SPAN = 7
+
+# Entries compared by the profile's trend analysis (last N vs the N before)
+TREND_SIZE = 3
+
+
+def _ewma_alpha(span=EWMA_SPAN):
+    return 2 / (span + 1)
+
+
+def empty_metrics():
+    """Metrics for a user with no history"""
+    return {
+        "count": 0,
+        "sums": {metric: 0.0 for metric in METRICS},
+        "ewma": {metric: None for metric in METRICS},
+        "last_day": None,
+        # [day ordinal, steps, calories, sleep_hours] rows, sorted by day
+        "tail": [],
+    }
+
+
+def _trim_tail(tail, last_day):
+    keep_after = last_day - max(ROLLING_WINDOWS)
+    keep_from = min(len(tail) - 2 * TREND_SIZE, next((i for i, row in enumerate(tail) if row[0] > keep_after), len(tail)))
+    return tail[max(keep_from, 0):]
+
+
+def build_metrics(df):
+    """Build the metrics cache from a full activity history"""
+    metrics = empty_metrics()
+    if df.empty:
+        return metrics
+
+    df = df.sort_values("date")
+    days = pd.to_datetime(df["date"]).to_numpy().astype("datetime64[D]").astype("int64") + date(1970, 1, 1).toordinal()
+    values = df[METRICS].to_numpy(dtype="float64")
+
+    metrics["count"] = int(len(df))
+    metrics["sums"] = {metric: float(total) for metric, total in zip(METRICS, values.sum(axis=0))}
+    ewma = df[METRICS].astype("float64").ewm(span=EWMA_SPAN, adjust=False).mean().iloc[-1]
+    metrics["ewma"] = {metric: float(ewma[metric]) for metric in METRICS}
+    metrics["last_day"] = int(days[-1])
+    tail = [[int(day)] + row.tolist() for day, row in zip(days, values)]
+    metrics["tail"] = _trim_tail(tail, metrics["last_day"])
+    return metrics
+
+
+def update_metrics(metrics, entry, history_loader=None):
+    """Fold one new log entry into the cache
+
+    Entries after the latest logged day are applied in O(1). A back-filled
+    day changes the EWMA and window ordering, so the cache is rebuilt from
+    history_loader() (the full history including entry) instead.
+    """
+    day = pd.Timestamp(entry["date"]).date().toordinal()
+    if metrics["last_day"] is not None and day <= metrics["last_day"] and history_loader is not None:
+        return build_metrics(history_loader())
+
+    row = [float(entry[metric]) for metric in METRICS]
+    alpha = _ewma_alpha()
+    metrics["count"] += 1
+    for metric, value in zip(METRICS, row):
+        metrics["sums"][metric] += value
+        previous = metrics["ewma"][metric]
+        metrics["ewma"][metric] = value if previous is None else alpha * value + (1 - alpha) * previous
+    metrics["last_day"] = day if metrics["last_day"] is None else max(metrics["last_day"], day)
+    metrics["tail"] = _trim_tail(metrics["tail"] + [[day] + row], metrics["last_day"])
+    return metrics
+
+
+def metric_averages(metrics):
+    """Mean of each metric over the whole history"""
+    if not metrics["count"]:
+        return {metric: float("nan") for metric in METRICS}
+    return {metric: metrics["sums"][metric] / metrics["count"] for metric in METRICS}
+
+
+def rolling_averages(metrics, days):
+    """Mean of each metric over the last `days` days ending at the latest entry, plus the entry count"""
+    if not metrics["tail"]:
+        return {"entries": 0, **{metric: float("nan") for metric in METRICS}}
+    tail = np.array(metrics["tail"], dtype="float64")
+    window = tail[tail[:, 0] > metrics["last_day"] - days]
+    return {"entries": len(window), **{metric: float(window[:, i + 1].mean()) for i, metric in enumerate(METRICS)}}
+
+
+def rolling_summary(metrics):
+    """Rolling window and EWMA averages as a small display table"""
+    rows = []
+    for days in ROLLING_WINDOWS:
+        averages = rolling_averages(metrics, days)
+        rows.append({"Window": f"Last {days} days", "Entries": averages["entries"],
+                     **{metric: averages[metric] for metric in METRICS}})
+    rows.append({"Window": f"EWMA ({EWMA_SPAN}-entry span)", "Entries": metrics["count"], **metrics["ewma"]})
+    return pd.DataFrame(rows).rename(columns={"steps": "Steps", "calories": "Calories", "sleep_hours": "Sleep (h)"})
+
+
+def entry_trend(metrics, size=TREND_SIZE):
+    """Mean of the last `size` entries and of the `size` before them, or None if there are too few"""
+    if len(metrics["tail"]) < 2 * size:
+        return None
+    tail = np.array(metrics["tail"][-2 * size:], dtype="float64")
+    previous, recent = tail[:size, 1:].mean(axis=0), tail[size:, 1:].mean(axis=0)
+    return dict(zip(METRICS, recent.tolist())), dict(zip(METRICS, previous.tolist()))
@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+USER_FIELDS = ["password_hash", "username", "age", "height_cm", "weight_kg", "bmi", "registration_date"]
+
+
+class UserStore:
+    """Interface every user account backend implements"""
+
+    def get_user(self, email):
+        """Return the account record for email, or None"""
+        raise NotImplementedError
+
+    def create_user(self, email, record):
+        """Insert a new account, returning False if the email is already taken"""
+        raise NotImplementedError
+
+    def update_user(self, email, fields):
+        """Update some fields of an existing account, returning False if it is missing"""
+        raise NotImplementedError
+
+    def upsert_users(self, records):
+        """Insert or replace many accounts at once from an {email: record} mapping"""
+        raise NotImplementedError
+
+    def count_users(self):
+        """Return the number of stored accounts"""
+        raise NotImplementedError
+
+    def get_meta(self, key):
+        """Return a bookkeeping value stored alongside the accounts"""
+        raise NotImplementedError
+
+    def set_meta(self, key, value):
+        """Store a bookkeeping value alongside the accounts"""
+        raise NotImplementedError
+
+
+class SQLiteUserStore(UserStore):
+    """User accounts in a SQLite table keyed (and indexed) by email"""
+
+    def __init__(self, path="users.db"):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    email TEXT PRIMARY KEY,
+                    password_hash TEXT NOT NULL,
+                    username TEXT,
+                    age INTEGER,
+                    height_cm INTEGER,
+                    weight_kg REAL,
+                    bmi REAL,
+                    registration_date TEXT
+                )
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _connect(self):
+        # Streamlit runs each session in its own thread, so keep one connection per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_user(self, email):
+        row = self._connect().execute(
+            f"SELECT {', '.join(USER_FIELDS)} FROM users WHERE email = ?", (email,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def create_user(self, email, record):
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                f"INSERT OR IGNORE INTO users (email, {', '.join(USER_FIELDS)}) "
+                f"VALUES (?, {', '.join('?' for _ in USER_FIELDS)})",
+                [email] + [record.get(field) for field in USER_FIELDS]
+            )
+        return cursor.rowcount == 1
+
+    def update_user(self, email, fields):
+        columns = [field for field in USER_FIELDS if field in fields]
+        if not columns:
+            return self.get_user(email) is not None
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                f"UPDATE users SET {', '.join(f'{column} = ?' for column in columns)} WHERE email = ?",
+                [fields[column] for column in columns] + [email]
+            )
+        return cursor.rowcount == 1
+
+    def upsert_users(self, records):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO users (email, {', '.join(USER_FIELDS)}) "
+                f"VALUES (?, {', '.join('?' for _ in USER_FIELDS)})",
+                ([email] + [record.get(field) for field in USER_FIELDS] for email, record in records.items())
+            )
+        return len(records)
+
+    def count_users(self):
+        return self._connect().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def get_meta(self, key):
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+
+USER_STORE_BACKENDS = {
+    "sqlite": SQLiteUserStore,
+}
+
+
+def open_user_store(backend=None, **options):
+    """Open the configured user store backend (WELLNEST_USER_STORE, default sqlite)"""
+    backend = backend or os.getenv("WELLNEST_USER_STORE", "sqlite")
+    if backend not in USER_STORE_BACKENDS:
+        raise ValueError(f"Unknown user store backend: {backend}")
+    return USER_STORE_BACKENDS[backend](**options)
+
+
+def migrate_json_users(store, json_path="users.json"):
+    """Copy accounts from the legacy users.json into the store, once"""
+    if store.get_meta("json_migrated") or not os.path.exists(json_path):
+        return 0
+
+    with open(json_path, 'r') as f:
+        users = json.load(f)
+
+    migrated = store.upsert_users(users)
+    store.set_meta("json_migrated", json_path)
+    return migrated
+
+
+if __name__ == "__main__":
+    json_path = sys.argv[1] if len(sys.argv) > 1 else "users.json"
+    user_store = open_user_store()
+    print(f"Migrated {migrate_json_users(user_store, json_path)} users ({user_store.count_users()} total)")
@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from fitbit_ingest import parse_dates
+
+# Days averaged into the smoothed trend line
+TREND_WINDOW_DAYS = 7
+
+# Days of history the weekly rate of change is fitted over
+RATE_WINDOW_DAYS = 30
+
+# Explicit schema of the Fitbit weight export
+FITBIT_WEIGHT_DTYPES = {"Id": "int64", "Date": "str", "WeightKg": "float64", "Fat": "float64", "BMI": "float64", "LogId": "int64"}
+FITBIT_WEIGHT_DATE_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+
+
+def bmi_values(weight_kg, height_cm):
+    """BMI of every weight in an array at one height"""
+    height_m = float(height_cm) / 100
+    return np.asarray(weight_kg, dtype="float64") / (height_m ** 2)
+
+
+def empty_weight_history():
+    """Return an empty weight series indexed by date"""
+    return pd.Series(dtype="float64", index=pd.DatetimeIndex([], name="date"), name="weight_kg")
+
+
+class WeightLog:
+    """Per-user weight log: an append-only CSV read back as a date-indexed series
+
+    One weigh-in per day is kept; a later entry for the same day replaces
+    the earlier one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def version(self):
+        """Identity of the log file; changes whenever an entry is appended or the log is reset"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def append(self, day, weight_kg):
+        """Append one weigh-in without rewriting the log"""
+        new_log = not os.path.exists(self.path)
+        with open(self.path, 'a') as f:
+            if new_log:
+                f.write("date,weight_kg\n")
+            f.write(f"{pd.Timestamp(day).strftime('%Y-%m-%d')},{float(weight_kg)}\n")
+
+    def load(self):
+        """Load the log as a float series indexed by day, sorted by date"""
+        if not os.path.exists(self.path):
+            return empty_weight_history()
+        df = pd.read_csv(self.path, dtype={"date": "str", "weight_kg": "float64"})
+        if df.empty:
+            return empty_weight_history()
+        history = pd.Series(df["weight_kg"].to_numpy(), index=pd.DatetimeIndex(pd.to_datetime(df["date"], format="%Y-%m-%d"), name="date"),
+                            name="weight_kg")
+        history = history[~history.index.duplicated(keep="last")]
+        return history.sort_index()
+
+    def reset(self):
+        """Delete the log"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def weight_trend(history, height_cm, window_days=TREND_WINDOW_DAYS):
+    """Weight and BMI of every weigh-in with their smoothed trend lines, one row per day"""
+    trend_kg = history.rolling(f"{window_days}D").mean()
+    return pd.DataFrame({
+        "date": history.index,
+        "weight_kg": history.to_numpy(),
+        "bmi": bmi_values(history.to_numpy(), height_cm),
+        "trend_kg": trend_kg.to_numpy(),
+        "trend_bmi": bmi_values(trend_kg.to_numpy(), height_cm),
+    })
+
+
+def weekly_rate(trend, window_days=RATE_WINDOW_DAYS):
+    """Least-squares kg per week over the last window_days of a weight trend, or None with too few weigh-ins"""
+    if trend.empty:
+        return None
+    recent = trend[trend["date"] > trend["date"].iloc[-1] - pd.Timedelta(days=window_days)]
+    days = recent["date"].to_numpy().astype("datetime64[D]").astype("float64")
+    if len(recent) < 2 or days[-1] == days[0]:
+        return None
+    return float(np.polyfit(days, recent["weight_kg"].to_numpy(), 1)[0] * 7)
+
+
+def load_fitbit_weights(path):
+    """Read the Fitbit weight export into typed Id, date, weight_kg, bmi, fat and LogId columns"""
+    raw = pd.read_csv(path, usecols=list(FITBIT_WEIGHT_DTYPES), dtype=FITBIT_WEIGHT_DTYPES)
+    return pd.DataFrame({
+        "Id": raw["Id"].to_numpy(),
+        "date": parse_dates(raw["Date"].to_numpy(dtype=object), FITBIT_WEIGHT_DATE_FORMAT),
+        "weight_kg": raw["WeightKg"].to_numpy(),
+        "bmi": raw["BMI"].to_numpy(),
+        "fat": raw["Fat"].to_numpy(),
+        "LogId": raw["LogId"].to_numpy(),
+    })
+
+
+def population_weight_view(weights):
+    """Latest weight and BMI of each population Id, plus their sorted distributions
+
+    The distributions use comparison's index layout, so percentile_rank
+    works on the view directly.
+    """
+    latest = weights.sort_values("LogId").groupby("Id")[["weight_kg", "bmi"]].last()
+    return {
+        "latest": latest,
+        "all": {column: np.sort(latest[column].dropna().to_numpy()) for column in latest.columns},
+        "cohorts": {},
+    }